@@ -6,13 +6,16 @@ import streamlit as st
 import pandas as pd
 from pathlib import Path
 from datetime import datetime
+from io import BytesIO
+import importlib.util
 import os
 
 from config import Config
 from src.database import DatabaseManager
 from src.ocr import OCRProcessor
 from src.llm import InvoiceExtractor
-from src.utils import DateParser, AmountParser, Validator
+from src.pipeline import ExtractionPipeline
+from src.utils import DateParser, AmountParser, Validator, content_hash
 from src.logger import setup_logger
 
 # Setup logging
@@ -58,6 +61,54 @@ def validate_configuration():
         st.stop()
 
 
+@st.cache_resource
+def get_db_manager():
+    """Create a single DatabaseManager shared across sessions and reruns."""
+    return DatabaseManager()
+
+
+@st.cache_resource
+def get_ocr_processor():
+    """Create a single OCRProcessor so its OCR text cache is shared across sessions."""
+    return OCRProcessor()
+
+
+@st.cache_resource(max_entries=8)
+def get_invoice_extractor(provider, model_name, api_key):
+    """
+    Create an InvoiceExtractor once per provider, model, and API key.
+    
+    Reruns, sessions, and the sidebar's model listing reuse the same client
+    instead of configuring a new one on every script run.
+    """
+    return InvoiceExtractor(provider=provider, model_name=model_name, api_key=api_key)
+
+
+@st.cache_data(ttl=Config.MODEL_LIST_TTL_SECONDS, show_spinner=False)
+def fetch_provider_models(provider, api_key):
+    """
+    Fetch the models available for a provider, refetched at most once per TTL.
+    
+    The sidebar renders on every rerun; without the cache each widget change
+    would query the provider's model list over the network. An empty list
+    raises instead, since exceptions are not cached: a provider that is down
+    (e.g. Ollama not started yet) is asked again on the next rerun while the
+    other providers' lists stay cached.
+    """
+    models = get_invoice_extractor(provider, None, api_key).list_available_models()
+    if not models:
+        raise LookupError(f"No models available for provider {provider}")
+    return models
+
+
+def list_provider_models(provider, api_key):
+    """List the models available for a provider, or an empty list if none were found."""
+    try:
+        return fetch_provider_models(provider, api_key)
+    except LookupError:
+        return []
+
+
 def initialize_app():
     """Initialize application components."""
     if 'initialized' not in st.session_state:
@@ -77,19 +128,15 @@ def initialize_app():
             st.session_state.openai_api_key = Config.OPENAI_API_KEY
 
         # Initialize components
-        st.session_state.db_manager = DatabaseManager()
-        st.session_state.ocr_processor = OCRProcessor()
+        st.session_state.db_manager = get_db_manager()
+        st.session_state.ocr_processor = get_ocr_processor()
         
         # Create initial extractor
         provider = st.session_state.selected_provider
         model = st.session_state.selected_model
         api_key = st.session_state.google_api_key if provider == 'google' else st.session_state.openai_api_key
         
-        st.session_state.invoice_extractor = InvoiceExtractor(
-            provider=provider,
-            model_name=model,
-            api_key=api_key
-        )
+        st.session_state.invoice_extractor = get_invoice_extractor(provider, model, api_key)
         st.session_state.initialized = True
         
         logger.info(f"Application initialized with {provider} ({model})")
@@ -125,116 +172,190 @@ def render_statistics():
         st.metric("Unique Companies", stats['unique_companies'])
 
 
-def process_invoice_file(uploaded_file, idx):
+def extract_uploaded_invoices(uploaded_files):
     """
-    Process a single uploaded invoice file.
+    OCR all uploaded invoice files and extract their data in batched LLM calls.
+    
+    Files that were extracted before with the same model are served from the
+    extraction cache and skip both OCR and the LLM.
     
     Args:
-        uploaded_file: Streamlit UploadedFile object
-        idx: Index for unique widget keys
+        uploaded_files: List of Streamlit UploadedFile objects
+        
+    Returns:
+        List of (extracted_data, error) tuples in upload order. extracted_data is
+        None when the file could not be processed.
     """
-    st.subheader(f"📄 {uploaded_file.name}")
+    db_manager = st.session_state.db_manager
+    extractor = st.session_state.invoice_extractor
+    model_key = extractor.cache_key
     
+    hashes = [content_hash(uploaded_file.getvalue()) for uploaded_file in uploaded_files]
     try:
-        # Create progress indicator
+        extracted_by_hash = db_manager.get_cached_extractions(hashes, model_key)
+    except Exception as e:
+        logger.error(f"Extraction cache lookup failed: {e}")
+        extracted_by_hash = {}
+    
+    pending = [
+        idx for idx, file_hash in enumerate(hashes)
+        if file_hash not in extracted_by_hash
+    ]
+    errors = {}
+    
+    if pending:
         progress_bar = st.progress(0)
         status_text = st.empty()
         
-        # Step 1: Extract text using OCR
-        status_text.text("🔍 Extracting text from PDF...")
-        progress_bar.progress(25)
-        
-        pdf_bytes = uploaded_file.read()
-        
-        # Save temporarily for processing
-        temp_path = Path(uploaded_file.name)
-        with open(temp_path, "wb") as f:
-            f.write(pdf_bytes)
-        
-        invoice_text = st.session_state.ocr_processor.extract_text_from_pdf(str(temp_path))
+        def show_progress(message, fraction):
+            status_text.text(message)
+            progress_bar.progress(min(int(fraction * 100), 100))
         
-        # Cleanup temp file
-        temp_path.unlink(missing_ok=True)
+        # OCR of later files overlaps with LLM extraction of earlier batches;
+        # files whose text was extracted before (e.g. a re-scan) skip the LLM
+        pipeline = ExtractionPipeline(
+            st.session_state.ocr_processor,
+            extractor,
+            cache=db_manager,
+            cache_key=model_key
+        )
+        results = pipeline.run(
+            [uploaded_files[idx].getvalue() for idx in pending],
+            on_progress=show_progress
+        )
         
-        # Step 2: Extract data using LLM
-        status_text.text("🤖 Analyzing invoice with AI...")
-        progress_bar.progress(50)
+        new_extractions = {}
+        for idx, (data, error) in zip(pending, results):
+            if error:
+                errors[idx] = error
+                logger.error(f"Error processing file {uploaded_files[idx].name}: {error}")
+                continue
+            extracted_by_hash[hashes[idx]] = data
+            # Failed extractions are not cached so the next upload tries again
+            if any(value != "Unknown" for value in data.values()):
+                new_extractions[hashes[idx]] = data
         
-        extracted_data = st.session_state.invoice_extractor.extract_invoice_data(invoice_text)
+        if new_extractions:
+            try:
+                db_manager.cache_extractions(new_extractions, model_key)
+            except Exception as e:
+                logger.error(f"Failed to cache extraction results: {e}")
         
-        progress_bar.progress(75)
-        status_text.text("✅ Extraction complete!")
         progress_bar.progress(100)
-        
-        # Step 3: Display and allow editing
-        st.success("✅ Invoice data extracted successfully!")
-        
-        with st.form(key=f"invoice_form_{idx}"):
-            st.write("**Review and edit the extracted information:**")
-            
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                company_name = st.text_input(
-                    "Company Name",
-                    value=extracted_data['company_name'],
-                    key=f"company_{idx}"
-                )
-                
-                invoice_date_str = st.text_input(
-                    "Invoice Date (DD-MM-YYYY or any format)",
-                    value=extracted_data['invoice_date'],
-                    key=f"date_{idx}",
-                    help="Supports various date formats: DD-MM-YYYY, DD/MM/YYYY, DD-Mon-YY, etc."
-                )
-            
-            with col2:
-                total_amount_str = st.text_input(
-                    "Total Amount",
-                    value=extracted_data['total_amount'],
-                    key=f"amount_{idx}",
-                    help="Enter numeric amount (currency symbols will be removed)"
-                )
-            
-            submitted = st.form_submit_button("💾 Save to Database", type="primary")
-            
-            if submitted:
-                # Validate and parse data
-                parsed_date = DateParser.parse_date(invoice_date_str)
-                parsed_amount = AmountParser.parse_amount(total_amount_str)
-                
-                errors = []
-                if not Validator.validate_company_name(company_name):
-                    errors.append("Invalid company name")
-                if not parsed_date:
-                    errors.append(f"Invalid date format: {invoice_date_str}")
-                if parsed_amount is None:
-                    errors.append(f"Invalid amount: {total_amount_str}")
-                
-                if errors:
-                    for error in errors:
-                        st.error(f"❌ {error}")
-                else:
-                    # Save to database
-                    try:
-                        invoice_id = st.session_state.db_manager.insert_invoice(
-                            company_name=company_name,
-                            invoice_date=parsed_date,
-                            total_amount=parsed_amount
-                        )
-                        st.success(f"✅ Invoice saved successfully! (ID: {invoice_id})")
-                        logger.info(f"Invoice {invoice_id} saved for {company_name}")
-                    except Exception as e:
-                        st.error(f"❌ Error saving invoice: {e}")
-                        logger.error(f"Failed to save invoice: {e}")
+        status_text.text("✅ Extraction complete!")
         
         # Cleanup
         progress_bar.empty()
         status_text.empty()
+    
+    return [
+        (extracted_by_hash.get(file_hash), errors.get(idx))
+        for idx, file_hash in enumerate(hashes)
+    ]
+
+
+def process_invoice_file(uploaded_file, idx, extracted_data):
+    """
+    Display extracted data for a single invoice for review and editing.
+    
+    Must be called inside a form.
+    
+    Args:
+        uploaded_file: Streamlit UploadedFile object
+        idx: Index for unique widget keys
+        extracted_data: Dictionary with company_name, invoice_date, and total_amount
         
+    Returns:
+        Tuple of (company_name, invoice_date_str, total_amount_str) as entered
+    """
+    st.subheader(f"📄 {uploaded_file.name}")
+    st.success("✅ Invoice data extracted successfully!")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        company_name = st.text_input(
+            "Company Name",
+            value=extracted_data['company_name'],
+            key=f"company_{idx}"
+        )
+        
+        invoice_date_str = st.text_input(
+            "Invoice Date (DD-MM-YYYY or any format)",
+            value=extracted_data['invoice_date'],
+            key=f"date_{idx}",
+            help="Supports various date formats: DD-MM-YYYY, DD/MM/YYYY, DD-Mon-YY, etc."
+        )
+    
+    with col2:
+        total_amount_str = st.text_input(
+            "Total Amount",
+            value=extracted_data['total_amount'],
+            key=f"amount_{idx}",
+            help="Enter numeric amount (currency symbols will be removed)"
+        )
+    
+    return company_name, invoice_date_str, total_amount_str
+
+
+def parse_invoice_entry(company_name, invoice_date_str, total_amount_str):
+    """
+    Validate and parse invoice data entered in the review form.
+    
+    Returns:
+        Tuple of (row, errors) where row is (company_name, invoice_date, total_amount)
+        ready for the database, or None if validation failed
+    """
+    parsed_date = DateParser.parse_date(invoice_date_str)
+    parsed_amount = AmountParser.parse_amount(total_amount_str)
+    
+    errors = []
+    if not Validator.validate_company_name(company_name):
+        errors.append("Invalid company name")
+    if not parsed_date:
+        errors.append(f"Invalid date format: {invoice_date_str}")
+    if parsed_amount is None:
+        errors.append(f"Invalid amount: {total_amount_str}")
+    
+    if errors:
+        return None, errors
+    return (company_name, parsed_date, parsed_amount), []
+
+
+def save_invoice_entries(entries):
+    """
+    Validate reviewed invoices and save them in a single transaction.
+    
+    Nothing is saved if any entry fails validation.
+    
+    Args:
+        entries: List of (file_name, (company_name, invoice_date_str, total_amount_str))
+    """
+    rows = []
+    has_errors = False
+    for file_name, entry in entries:
+        row, errors = parse_invoice_entry(*entry)
+        for error in errors:
+            st.error(f"❌ {file_name}: {error}")
+        has_errors = has_errors or bool(errors)
+        rows.append(row)
+    
+    if has_errors:
+        return
+    
+    # Save to database
+    try:
+        if len(rows) == 1:
+            invoice_id = st.session_state.db_manager.insert_invoice(*rows[0])
+            st.success(f"✅ Invoice saved successfully! (ID: {invoice_id})")
+            logger.info(f"Invoice {invoice_id} saved for {rows[0][0]}")
+        else:
+            invoice_ids = st.session_state.db_manager.insert_invoices(rows)
+            st.success(f"✅ {len(invoice_ids)} invoices saved successfully! (IDs: {invoice_ids[0]}-{invoice_ids[-1]})")
+            logger.info(f"{len(invoice_ids)} invoices saved")
     except Exception as e:
-        st.error(f"❌ Error processing {uploaded_file.name}: {str(e)}")
-        logger.error(f"Error processing file {uploaded_file.name}: {e}")
+        st.error(f"❌ Error saving invoice: {e}")
+        logger.error(f"Failed to save invoice: {e}")
 
 
 def render_upload_page():
@@ -253,12 +374,63 @@ def render_upload_page():
     if uploaded_files:
         st.write(f"**Processing {len(uploaded_files)} file(s)**")
         
-        for idx, uploaded_file in enumerate(uploaded_files):
-            with st.expander(f"📄 {uploaded_file.name}", expanded=True):
-                process_invoice_file(uploaded_file, idx)
+        results = extract_uploaded_invoices(uploaded_files)
+        
+        for uploaded_file, (extracted_data, error) in zip(uploaded_files, results):
+            if error:
+                st.error(f"❌ Error processing {uploaded_file.name}: {error}")
+        
+        extracted = [
+            (idx, uploaded_file, extracted_data)
+            for idx, (uploaded_file, (extracted_data, error)) in enumerate(zip(uploaded_files, results))
+            if not error
+        ]
+        if not extracted:
+            return
+        
+        # A single form keeps edits from triggering reruns until a save button is pressed
+        entries = {}
+        to_save = []
+        with st.form(key="invoices_form"):
+            st.write("**Review and edit the extracted information:**")
             
-            if idx < len(uploaded_files) - 1:
-                st.divider()
+            for position, (idx, uploaded_file, extracted_data) in enumerate(extracted):
+                with st.expander(f"📄 {uploaded_file.name}", expanded=True):
+                    entries[idx] = (uploaded_file.name, process_invoice_file(uploaded_file, idx, extracted_data))
+                    if st.form_submit_button(f"💾 Save Invoice {idx + 1} to Database"):
+                        to_save = [idx]
+                
+                if position < len(extracted) - 1:
+                    st.divider()
+            
+            if len(entries) > 1:
+                if st.form_submit_button("💾 Save All to Database", type="primary"):
+                    to_save = list(entries)
+        
+        if to_save:
+            save_invoice_entries([entries[idx] for idx in to_save])
+
+
+# xlsxwriter writes noticeably faster than openpyxl; use whichever is installed
+EXCEL_ENGINE = next(
+    (engine for engine in ('xlsxwriter', 'openpyxl') if importlib.util.find_spec(engine)),
+    None
+)
+
+
+def reset_export_requests():
+    """Forget requested downloads, so they are only rebuilt when asked for again."""
+    st.session_state.export_requested = False
+    st.session_state.excel_requested = False
+
+
+@st.cache_data(show_spinner=False)
+def build_excel_bytes(df):
+    """Serialize search results to an .xlsx file, reusing the result for identical data."""
+    buffer = BytesIO()
+    with pd.ExcelWriter(buffer, engine=EXCEL_ENGINE) as writer:
+        df.to_excel(writer, index=False, sheet_name='Invoices')
+    return buffer.getvalue()
 
 
 def render_search_page():
@@ -315,31 +487,55 @@ def render_search_page():
         if from_date_str and to_date_str:
             if not DateParser.validate_date_range(from_date_str, to_date_str):
                 st.error("❌ Invalid date range: 'From Date' must be before or equal to 'To Date'")
+                st.session_state.pop('search_filters', None)
                 return
         
+        # Keep the filters so paging through results survives reruns
+        st.session_state.search_filters = {
+            'from_date': from_date_str,
+            'to_date': to_date_str,
+            'company_name': company_filter
+        }
+        st.session_state.search_page = 1
+        reset_export_requests()
+    
+    filters = st.session_state.get('search_filters')
+    if filters is not None:
         # Search database
         try:
-            results = st.session_state.db_manager.search_invoices(
-                from_date=from_date_str,
-                to_date=to_date_str,
-                company_name=company_filter
-            )
+            db_manager = st.session_state.db_manager
+            total_results = db_manager.count_invoices(**filters)
             
-            if results:
-                st.success(f"✅ Found {len(results)} invoice(s)")
+            if total_results:
+                st.success(f"✅ Found {total_results} invoice(s)")
                 
-                # Create DataFrame
-                df = pd.DataFrame(
-                    results,
-                    columns=["ID", "Company Name", "Invoice Date", "Total Amount"]
+                # Only one page of rows is loaded at a time
+                page_size = Config.SEARCH_PAGE_SIZE
+                page_count = (total_results + page_size - 1) // page_size
+                page = 1
+                if page_count > 1:
+                    page = st.number_input(
+                        f"Page (of {page_count}, {page_size} rows each)",
+                        min_value=1,
+                        max_value=page_count,
+                        key="search_page",
+                        on_change=reset_export_requests
+                    )
+                
+                results = db_manager.search_invoices(
+                    **filters,
+                    limit=page_size,
+                    offset=(page - 1) * page_size
                 )
                 
-                # Format amount column
-                df['Total Amount'] = df['Total Amount'].apply(lambda x: f"${x:,.2f}")
+                # Create DataFrame
+                columns = ["ID", "Company Name", "Invoice Date", "Total Amount"]
+                df = pd.DataFrame(results, columns=columns)
                 
-                # Display table
+                # Display table (amount formatted for display only, so the
+                # column stays numeric for sorting and in the downloads)
                 st.dataframe(
-                    df,
+                    df.style.format({'Total Amount': '${:,.2f}'}),
                     use_container_width=True,
                     hide_index=True
                 )
@@ -347,34 +543,46 @@ def render_search_page():
                 # Download options
                 st.subheader("📥 Download Results")
                 
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    # CSV download
-                    csv = df.to_csv(index=False)
-                    st.download_button(
-                        label="📄 Download as CSV",
-                        data=csv,
-                        file_name=f"invoices_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                        mime="text/csv"
-                    )
+                # Downloads contain every match, not just the page on screen;
+                # with several pages, all rows are only loaded once asked for
+                export_df = df
+                if page_count > 1:
+                    export_df = None
+                    if st.button(f"📦 Prepare downloads of all {total_results} invoices"):
+                        st.session_state.export_requested = True
+                    
+                    if st.session_state.get('export_requested'):
+                        export_df = pd.DataFrame(db_manager.search_invoices(**filters), columns=columns)
                 
-                with col2:
-                    # Excel download (if openpyxl available)
-                    try:
-                        from io import BytesIO
-                        buffer = BytesIO()
-                        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-                            df.to_excel(writer, index=False, sheet_name='Invoices')
-                        
+                if export_df is not None:
+                    col1, col2 = st.columns(2)
+                    
+                    with col1:
+                        # CSV download
+                        csv = export_df.to_csv(index=False)
                         st.download_button(
-                            label="📊 Download as Excel",
-                            data=buffer.getvalue(),
-                            file_name=f"invoices_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                            label="📄 Download as CSV",
+                            data=csv,
+                            file_name=f"invoices_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                            mime="text/csv"
                         )
-                    except ImportError:
-                        st.caption("Excel export requires openpyxl package")
+                    
+                    with col2:
+                        # Excel download (if xlsxwriter or openpyxl available); the
+                        # workbook is only built once the user asks for it
+                        if EXCEL_ENGINE:
+                            if st.button("📊 Prepare Excel file"):
+                                st.session_state.excel_requested = True
+                            
+                            if st.session_state.get('excel_requested'):
+                                st.download_button(
+                                    label="📊 Download as Excel",
+                                    data=build_excel_bytes(export_df),
+                                    file_name=f"invoices_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
+                                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                                )
+                        else:
+                            st.caption("Excel export requires the xlsxwriter or openpyxl package")
             
             else:
                 st.warning("📭 No invoices found matching your criteria")
@@ -449,15 +657,12 @@ def render_sidebar():
     # Model Selection
     available_models = []
     
-    # Create a temporary extractor for listing models
-    temp_extractor = InvoiceExtractor(
-        provider=st.session_state.selected_provider,
-        api_key=st.session_state.google_api_key if st.session_state.selected_provider == 'google' else st.session_state.openai_api_key
-    )
-    
     with st.sidebar:
         with st.spinner("Fetching available models..."):
-            available_models = temp_extractor.list_available_models()
+            available_models = list_provider_models(
+                st.session_state.selected_provider,
+                st.session_state.google_api_key if st.session_state.selected_provider == 'google' else st.session_state.openai_api_key
+            )
 
     if st.session_state.selected_provider == 'ollama':
         if not available_models:
@@ -486,10 +691,10 @@ def render_sidebar():
             st.session_state.selected_model = new_model
             # Re-initialize extractor
             api_key = st.session_state.google_api_key if st.session_state.selected_provider == 'google' else st.session_state.openai_api_key
-            st.session_state.invoice_extractor = InvoiceExtractor(
-                provider=st.session_state.selected_provider,
-                model_name=new_model,
-                api_key=api_key
+            st.session_state.invoice_extractor = get_invoice_extractor(
+                st.session_state.selected_provider,
+                new_model,
+                api_key
             )
             st.toast(f"Model updated: {new_model}")
     else:
@@ -30,6 +30,35 @@ class Config:
     # Application Settings
     APP_TITLE = os.getenv('APP_TITLE', 'InvoiceIQ')
     MAX_PAGES_PER_PDF = int(os.getenv('MAX_PAGES_PER_PDF', '10'))
+    # Rows loaded per page on the search screen
+    SEARCH_PAGE_SIZE = int(os.getenv('SEARCH_PAGE_SIZE', '1000'))
+    
+    # OCR Settings
+    # 'tesseract' (CPU) or 'paddle' (PaddleOCR, GPU if available; needs paddleocr installed)
+    OCR_BACKEND = os.getenv('OCR_BACKEND', 'tesseract').lower()
+    OCR_USE_GPU = os.getenv('OCR_USE_GPU', 'true').lower() == 'true'
+    OCR_WORKERS = int(os.getenv('OCR_WORKERS', str(os.cpu_count() or 1)))
+    # Typed invoice text stays legible at 150 DPI; OCR cost grows with pixel count
+    OCR_DPI = int(os.getenv('OCR_DPI', '150'))
+    OCR_GRAYSCALE = os.getenv('OCR_GRAYSCALE', 'true').lower() == 'true'
+    # Pages whose mean OCR confidence (tesserocr only) is below the threshold
+    # are rendered again at the higher fallback DPI
+    OCR_MIN_CONFIDENCE = int(os.getenv('OCR_MIN_CONFIDENCE', '60'))
+    OCR_FALLBACK_DPI = int(os.getenv('OCR_FALLBACK_DPI', '200'))
+    # LSTM engine only (--oem 1) and a single uniform text block (--psm 6),
+    # which skips full page layout analysis; keeping interword spaces preserves
+    # the column layout of line items
+    OCR_LANGUAGE = os.getenv('OCR_LANGUAGE', 'eng')
+    TESSERACT_CONFIG = os.getenv('TESSERACT_CONFIG', '--oem 1 --psm 6 -c preserve_interword_spaces=1')
+    # Binarize pages before OCR
+    OCR_PREPROCESS = os.getenv('OCR_PREPROCESS', 'true').lower() == 'true'
+    # Also straighten skewed scans (needs OpenCV); off by default since
+    # born-upright pages only pay for the search
+    OCR_DESKEW = os.getenv('OCR_DESKEW', 'false').lower() == 'true'
+    # Number of recently OCR'd PDFs whose text is kept in memory
+    OCR_CACHE_SIZE = int(os.getenv('OCR_CACHE_SIZE', '32'))
+    # Born-digital PDFs with at least this much embedded text skip OCR entirely
+    TEXT_LAYER_MIN_CHARS = int(os.getenv('TEXT_LAYER_MIN_CHARS', '50'))
     
     # LLM Model Configuration
     # Available providers: google, ollama, openai
@@ -54,6 +83,24 @@ class Config:
     LLM_TOP_P = float(os.getenv('LLM_TOP_P', '0.95'))
     LLM_TOP_K = int(os.getenv('LLM_TOP_K', '64'))
     LLM_MAX_OUTPUT_TOKENS = int(os.getenv('LLM_MAX_OUTPUT_TOKENS', '8192'))
+    # Try rule-based (regex) extraction first; only invoices it can't fully
+    # read are sent to the LLM
+    RULE_BASED_EXTRACTION = os.getenv('RULE_BASED_EXTRACTION', 'false').lower() == 'true'
+    # Number of invoices sent to the LLM in a single request
+    LLM_BATCH_SIZE = int(os.getenv('LLM_BATCH_SIZE', '5'))
+    # Context window assumed when packing invoices into one request
+    LLM_CONTEXT_TOKENS = int(os.getenv('LLM_CONTEXT_TOKENS', '32000'))
+    # How long the sidebar's list of available models is reused before refetching
+    MODEL_LIST_TTL_SECONDS = int(os.getenv('MODEL_LIST_TTL_SECONDS', '300'))
+    # Maximum LLM requests in flight at once when extracting several batches
+    LLM_CONCURRENCY = int(os.getenv('LLM_CONCURRENCY', '4'))
+    # Number of LLM extractions kept in memory, keyed by invoice text, and how long they stay valid
+    LLM_CACHE_SIZE = int(os.getenv('LLM_CACHE_SIZE', '1024'))
+    LLM_CACHE_TTL_SECONDS = int(os.getenv('LLM_CACHE_TTL_SECONDS', '3600'))
+    # Keep the fixed Gemini instruction/prompt in a server-side context cache.
+    # Only pays off for prefixes above the API's minimum cacheable token count.
+    GEMINI_CONTEXT_CACHE = os.getenv('GEMINI_CONTEXT_CACHE', 'false').lower() == 'true'
+    GEMINI_CONTEXT_CACHE_TTL_MINUTES = int(os.getenv('GEMINI_CONTEXT_CACHE_TTL_MINUTES', '60'))
     
     # Logging
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
@@ -3,7 +3,8 @@ Database operations module for Invoice Data Extractor.
 Handles all SQLite database interactions.
 """
 import sqlite3
-from typing import List, Tuple, Optional, Dict, Any
+import threading
+from typing import Iterator, List, Tuple, Optional, Dict, Any
 from pathlib import Path
 from contextlib import contextmanager
 from datetime import datetime
@@ -17,6 +18,14 @@ logger = setup_logger(__name__)
 class DatabaseManager:
     """Manages database operations for invoice storage and retrieval."""
     
+    # Per-connection settings: with WAL, synchronous=NORMAL only fsyncs at
+    # checkpoints instead of on every commit, while staying corruption-safe.
+    CONNECTION_PRAGMAS = (
+        'PRAGMA synchronous=NORMAL',
+        'PRAGMA temp_store=MEMORY',
+        'PRAGMA cache_size=-64000',
+    )
+    
     def __init__(self, db_path: str = None):
         """
         Initialize database manager.
@@ -25,32 +34,58 @@ class DatabaseManager:
             db_path: Path to SQLite database file. Uses config default if not provided.
         """
         self.db_path = db_path or Config.DATABASE_PATH
+        
+        # One connection is opened lazily and reused for every operation; the
+        # lock serializes access from Streamlit sessions and pipeline threads.
+        self._conn = None
+        self._lock = threading.RLock()
+        self._fts_enabled = False
         self._initialize_database()
     
+    def _connect(self) -> sqlite3.Connection:
+        """Open the shared connection and apply the per-connection pragmas."""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        for pragma in self.CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+    
     @contextmanager
     def get_connection(self):
         """
-        Context manager for database connections.
-        Ensures proper connection cleanup.
+        Context manager for database access.
+        Runs the block as one transaction on the shared connection, committing
+        on success and rolling back on error.
         
         Yields:
             SQLite connection object
         """
-        conn = sqlite3.connect(self.db_path)
-        try:
-            yield conn
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            logger.error(f"Database error: {e}")
-            raise
-        finally:
-            conn.close()
+        with self._lock:
+            if self._conn is None:
+                self._conn = self._connect()
+            conn = self._conn
+            try:
+                yield conn
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Database error: {e}")
+                raise
+    
+    def close(self):
+        """Close the shared connection. It is reopened on next use."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
     
     def _initialize_database(self):
         """Create database tables if they don't exist."""
         with self.get_connection() as conn:
             cursor = conn.cursor()
+            
+            # WAL mode is persistent, so it only needs to be set once per database file
+            cursor.execute('PRAGMA journal_mode=WAL')
+            
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS invoices (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -62,18 +97,89 @@ class DatabaseManager:
                 )
             ''')
             
-            # Create index for faster searches
+            # Create index for faster searches. Dates are stored as ISO-8601
+            # (YYYY-MM-DD) text, so date range filters become index range scans.
             cursor.execute('''
-                CREATE INDEX IF NOT EXISTS idx_invoice_date 
-                ON invoices(invoice_date)
+                CREATE INDEX IF NOT EXISTS idx_invoices_date_company
+                ON invoices(invoice_date, company_name)
             ''')
+            # Superseded by the composite index above, which has the same leading column
+            cursor.execute('DROP INDEX IF EXISTS idx_invoice_date')
             cursor.execute('''
                 CREATE INDEX IF NOT EXISTS idx_company_name 
                 ON invoices(company_name)
             ''')
             
+            # Extraction results keyed by uploaded file content, so re-uploads skip OCR and the LLM
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS extraction_cache (
+                    content_hash TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    company_name TEXT NOT NULL,
+                    invoice_date TEXT NOT NULL,
+                    total_amount TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (content_hash, model)
+                )
+            ''')
+            
+            self._fts_enabled = self._initialize_company_search(cursor)
+            
             logger.info("Database initialized successfully")
     
+    @staticmethod
+    def _initialize_company_search(cursor: sqlite3.Cursor) -> bool:
+        """
+        Create the full-text index used for company name searches.
+        
+        Partial name matches (LIKE '%name%') cannot use a B-tree index, so
+        company names are mirrored into an FTS5 table with the trigram
+        tokenizer, which answers substring LIKE queries from its index. Triggers
+        keep it in sync with the invoices table.
+        
+        Returns:
+            True if the index is available, False if this SQLite build lacks
+            FTS5 or the trigram tokenizer (searches then scan the table)
+        """
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'invoices_fts'"
+        )
+        exists = cursor.fetchone() is not None
+        
+        try:
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS invoices_fts USING fts5(
+                    company_name, content='invoices', content_rowid='id', tokenize='trigram'
+                )
+            ''')
+        except sqlite3.OperationalError as e:
+            logger.warning(f"FTS5 trigram index unavailable, company search will scan: {e}")
+            return False
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS invoices_fts_insert AFTER INSERT ON invoices BEGIN
+                INSERT INTO invoices_fts(rowid, company_name) VALUES (new.id, new.company_name);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS invoices_fts_delete AFTER DELETE ON invoices BEGIN
+                INSERT INTO invoices_fts(invoices_fts, rowid, company_name)
+                VALUES ('delete', old.id, old.company_name);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS invoices_fts_update AFTER UPDATE OF company_name ON invoices BEGIN
+                INSERT INTO invoices_fts(invoices_fts, rowid, company_name)
+                VALUES ('delete', old.id, old.company_name);
+                INSERT INTO invoices_fts(rowid, company_name) VALUES (new.id, new.company_name);
+            END
+        ''')
+        
+        if not exists:
+            # Index invoices saved before the search table existed
+            cursor.execute("INSERT INTO invoices_fts(invoices_fts) VALUES ('rebuild')")
+        return True
+    
     def insert_invoice(
         self, 
         company_name: str, 
@@ -101,39 +207,104 @@ class DatabaseManager:
             logger.info(f"Inserted invoice {invoice_id} for {company_name}")
             return invoice_id
     
-    def search_invoices(
+    def insert_invoices(
         self,
-        from_date: Optional[str] = None,
-        to_date: Optional[str] = None,
-        company_name: Optional[str] = None
-    ) -> List[Tuple]:
+        invoices: List[Tuple[str, str, float]],
+        synchronous_off: bool = False
+    ) -> List[int]:
         """
-        Search invoices by date range and/or company name.
+        Insert multiple invoice records in a single transaction.
         
         Args:
-            from_date: Start date (YYYY-MM-DD)
-            to_date: End date (YYYY-MM-DD)
-            company_name: Company name to search for (partial match)
+            invoices: Tuples of (company_name, invoice_date, total_amount),
+                with invoice_date in YYYY-MM-DD format
+            synchronous_off: Skip fsyncs for this insert (PRAGMA synchronous=OFF).
+                Only for bulk rebuilds that can be re-run if the machine crashes.
             
         Returns:
-            List of invoice tuples (id, company_name, invoice_date, total_amount)
+            IDs of the inserted records, in input order
         """
-        query = "SELECT id, company_name, invoice_date, total_amount FROM invoices WHERE 1=1"
+        invoices = list(invoices)
+        if not invoices:
+            return []
+        
+        # Hold the lock across the pragma changes so no other operation runs unsynced
+        with self._lock:
+            if synchronous_off:
+                with self.get_connection() as conn:
+                    conn.execute('PRAGMA synchronous=OFF')
+            try:
+                with self.get_connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.executemany(
+                        'INSERT INTO invoices (company_name, invoice_date, total_amount) VALUES (?, ?, ?)',
+                        invoices
+                    )
+                    # AUTOINCREMENT assigns consecutive IDs within a single write transaction
+                    last_id = cursor.execute('SELECT last_insert_rowid()').fetchone()[0]
+            finally:
+                if synchronous_off:
+                    with self.get_connection() as conn:
+                        conn.execute('PRAGMA synchronous=NORMAL')
+        
+        logger.info(f"Inserted {len(invoices)} invoices")
+        return list(range(last_id - len(invoices) + 1, last_id + 1))
+    
+    def _build_search_filter(
+        self,
+        from_date: Optional[str],
+        to_date: Optional[str],
+        company_name: Optional[str]
+    ) -> Tuple[str, List[Any]]:
+        """Build the WHERE clause and parameters shared by search and count queries."""
+        where = " WHERE 1=1"
         params = []
         
         if from_date:
-            query += " AND invoice_date >= ?"
+            where += " AND invoice_date >= ?"
             params.append(from_date)
         
         if to_date:
-            query += " AND invoice_date <= ?"
+            where += " AND invoice_date <= ?"
             params.append(to_date)
         
-        if company_name:
-            query += " AND company_name LIKE ?"
+        if company_name and self._fts_enabled:
+            where += " AND id IN (SELECT rowid FROM invoices_fts WHERE company_name LIKE ?)"
+            params.append(f"%{company_name}%")
+        elif company_name:
+            where += " AND company_name LIKE ?"
             params.append(f"%{company_name}%")
         
-        query += " ORDER BY invoice_date DESC"
+        return where, params
+    
+    def search_invoices(
+        self,
+        from_date: Optional[str] = None,
+        to_date: Optional[str] = None,
+        company_name: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0
+    ) -> List[Tuple]:
+        """
+        Search invoices by date range and/or company name.
+        
+        Args:
+            from_date: Start date (YYYY-MM-DD)
+            to_date: End date (YYYY-MM-DD)
+            company_name: Company name to search for (partial match)
+            limit: Maximum number of rows to return (all rows if None)
+            offset: Number of matching rows to skip, used with limit for paging
+            
+        Returns:
+            List of invoice tuples (id, company_name, invoice_date, total_amount)
+        """
+        where, params = self._build_search_filter(from_date, to_date, company_name)
+        query = "SELECT id, company_name, invoice_date, total_amount FROM invoices" + where
+        query += " ORDER BY invoice_date DESC, id DESC"
+        
+        if limit is not None:
+            query += " LIMIT ? OFFSET ?"
+            params.extend([limit, offset])
         
         with self.get_connection() as conn:
             cursor = conn.cursor()
@@ -142,6 +313,30 @@ class DatabaseManager:
             logger.info(f"Search returned {len(results)} results")
             return results
     
+    def count_invoices(
+        self,
+        from_date: Optional[str] = None,
+        to_date: Optional[str] = None,
+        company_name: Optional[str] = None
+    ) -> int:
+        """
+        Count invoices matching the same filters as search_invoices.
+        
+        Args:
+            from_date: Start date (YYYY-MM-DD)
+            to_date: End date (YYYY-MM-DD)
+            company_name: Company name to search for (partial match)
+            
+        Returns:
+            Number of matching invoices
+        """
+        where, params = self._build_search_filter(from_date, to_date, company_name)
+        
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM invoices" + where, params)
+            return cursor.fetchone()[0]
+    
     def get_all_invoices(self) -> List[Tuple]:
         """
         Get all invoices from the database.
@@ -156,6 +351,53 @@ class DatabaseManager:
             )
             return cursor.fetchall()
     
+    def get_invoices_page(self, offset: int, limit: int) -> List[Tuple]:
+        """
+        Get one page of invoices, newest first.
+        
+        Args:
+            offset: Number of invoices to skip
+            limit: Maximum number of invoices to return
+            
+        Returns:
+            List of invoice tuples (id, company_name, invoice_date, total_amount)
+        """
+        return self.search_invoices(limit=limit, offset=offset)
+    
+    def iter_invoices(self, chunk_size: int = 200) -> Iterator[Tuple]:
+        """
+        Iterate over all invoices, newest first, holding one chunk in memory at a time.
+        
+        Each chunk is a separate keyset query continuing after the last row
+        seen, so the shared connection is not held while the caller consumes rows.
+        
+        Args:
+            chunk_size: Number of rows fetched per query
+            
+        Yields:
+            Invoice tuples (id, company_name, invoice_date, total_amount)
+        """
+        query = "SELECT id, company_name, invoice_date, total_amount FROM invoices"
+        order = " ORDER BY invoice_date DESC, id DESC LIMIT ?"
+        last = None
+        
+        while True:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                if last is None:
+                    cursor.execute(query + order, (chunk_size,))
+                else:
+                    cursor.execute(
+                        query + " WHERE (invoice_date, id) < (?, ?)" + order,
+                        (last[2], last[0], chunk_size)
+                    )
+                rows = cursor.fetchall()
+            
+            yield from rows
+            if len(rows) < chunk_size:
+                return
+            last = rows[-1]
+    
     def delete_invoice(self, invoice_id: int) -> bool:
         """
         Delete an invoice by ID.
@@ -174,6 +416,56 @@ class DatabaseManager:
                 logger.info(f"Deleted invoice {invoice_id}")
             return deleted
     
+    def get_cached_extractions(self, content_hashes: List[str], model: str) -> Dict[str, Dict[str, str]]:
+        """
+        Look up previously extracted invoice data.
+        
+        Args:
+            content_hashes: Content hashes of the uploaded files
+            model: Provider and model identifier the data was extracted with
+            
+        Returns:
+            Mapping of content hash to extracted data for every cache hit
+        """
+        if not content_hashes:
+            return {}
+        
+        placeholders = ", ".join("?" for _ in content_hashes)
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"SELECT content_hash, company_name, invoice_date, total_amount FROM extraction_cache "
+                f"WHERE model = ? AND content_hash IN ({placeholders})",
+                [model, *content_hashes]
+            )
+            return {
+                content_hash: {
+                    'company_name': company_name,
+                    'invoice_date': invoice_date,
+                    'total_amount': total_amount
+                }
+                for content_hash, company_name, invoice_date, total_amount in cursor.fetchall()
+            }
+    
+    def cache_extractions(self, extractions: Dict[str, Dict[str, str]], model: str) -> None:
+        """
+        Store extracted invoice data for later uploads of the same files.
+        
+        Args:
+            extractions: Mapping of content hash to extracted data
+            model: Provider and model identifier the data was extracted with
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(
+                'INSERT OR REPLACE INTO extraction_cache '
+                '(content_hash, model, company_name, invoice_date, total_amount) VALUES (?, ?, ?, ?, ?)',
+                [
+                    (content_hash, model, data['company_name'], data['invoice_date'], data['total_amount'])
+                    for content_hash, data in extractions.items()
+                ]
+            )
+    
     def get_statistics(self) -> Dict[str, Any]:
         """
         Get database statistics.
@@ -183,15 +475,13 @@ class DatabaseManager:
         """
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            
-            cursor.execute("SELECT COUNT(*) FROM invoices")
-            total_count = cursor.fetchone()[0]
-            
-            cursor.execute("SELECT SUM(total_amount) FROM invoices")
-            total_amount = cursor.fetchone()[0] or 0
-            
-            cursor.execute("SELECT COUNT(DISTINCT company_name) FROM invoices")
-            unique_companies = cursor.fetchone()[0]
+            cursor.execute(
+                """
+                SELECT COUNT(*), COALESCE(SUM(total_amount), 0), COUNT(DISTINCT company_name)
+                FROM invoices
+                """
+            )
+            total_count, total_amount, unique_companies = cursor.fetchone()
             
             return {
                 'total_invoices': total_count,
@@ -7,16 +7,213 @@ import google.generativeai as genai
 from google.generativeai.types import HarmCategory, HarmBlockThreshold
 from openai import OpenAI
 import requests
-from typing import Dict, Optional, Any
+from typing import Dict, List, Optional, Any
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import functools
 import re
 import json
+import threading
+import time
 
 from config import Config
 from src.ollama_client import OllamaClient
+from src.regex_extractor import extract_invoice_fields
+from src.utils import AmountParser, content_hash
 from src.logger import setup_logger
 
+try:
+    from google.generativeai import caching
+except ImportError:
+    # Context caching needs google-generativeai 0.7.0 or newer
+    caching = None
+
 logger = setup_logger(__name__)
 
+# Bump whenever the prompts or output parsing change, so cached extractions
+# made with the old prompt are not reused
+PROMPT_VERSION = 3
+
+# Patterns for parsing LLM output, compiled once at import
+_COMPANY_RE = re.compile(r"Company name:\s*([^\n]+?)\s*Invoice date:", re.IGNORECASE)
+_DATE_RE = re.compile(r"Invoice date:\s*([^\n]+?)\s*Total amount:", re.IGNORECASE)
+_AMOUNT_LINE_RE = re.compile(r"Total amount:\s*([^\n]+?)(?:\n|$)", re.IGNORECASE)
+# All three labelled fields in one pass; the per-field patterns above are the
+# fallback when the model reorders or drops a label
+_LABELLED_FIELDS_RE = re.compile(
+    r"Company name:\s*(?P<company_name>[^\n]+?)\s*"
+    r"Invoice date:\s*(?P<invoice_date>[^\n]+?)\s*"
+    r"Total amount:\s*(?P<total_amount>[^\n]+?)[ \t]*(?:\n|$)",
+    re.IGNORECASE
+)
+_BATCH_MARKER_RE = re.compile(r"Invoice\s+(\d+)\s*:", re.IGNORECASE)
+
+_FIELD_PATTERNS = {
+    'company_name': _COMPANY_RE,
+    'invoice_date': _DATE_RE,
+    'total_amount': _AMOUNT_LINE_RE
+}
+
+
+# Gemini context caches keyed by (API key, model, system instruction, prompt), each
+# stored with its expiry time. None marks a prefix the API refused to cache.
+_context_caches = {}
+_context_caches_lock = threading.Lock()
+
+# Recent LLM extractions keyed by provider, model, prompt version and invoice
+# text, each stored with its expiry time. Shared by all extractor instances.
+_response_cache = OrderedDict()
+_response_cache_lock = threading.Lock()
+
+
+SAFETY_SETTINGS = {
+    HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_LOW_AND_ABOVE,
+    HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_LOW_AND_ABOVE,
+}
+
+# JSON mode guarantees parseable output and trims response tokens
+GOOGLE_GENERATION_CONFIG = {
+    **Config.get_generation_config(),
+    "response_mime_type": "application/json"
+}
+
+# Keyword arguments shared by every Gemini model
+_GOOGLE_MODEL_OPTIONS = {
+    "generation_config": GOOGLE_GENERATION_CONFIG,
+    "safety_settings": SAFETY_SETTINGS
+}
+
+
+# genai.configure() replaces the SDK's global client, so it is only called
+# when the key actually changes
+_configured_google_key = None
+_configure_google_lock = threading.Lock()
+
+
+def _configure_google(api_key: str) -> None:
+    """Point the Gemini SDK at api_key unless it is already configured with it."""
+    global _configured_google_key
+    with _configure_google_lock:
+        if api_key != _configured_google_key:
+            genai.configure(api_key=api_key)
+            _configured_google_key = api_key
+
+
+@functools.lru_cache(maxsize=4)
+def _get_google_model(model_name: str, system_instruction: str, api_key: str):
+    """
+    Create and configure a Google GenerativeModel.
+    
+    Cached so Streamlit reruns and new InvoiceExtractor instances reuse the
+    same model object instead of rebuilding it on every call. A model keeps
+    the client it first used, so the API key is part of the cache key and a
+    corrected key gets a fresh model.
+    
+    Returns:
+        Tuple of (model, whether the model carries the system instruction)
+    """
+    try:
+        model = genai.GenerativeModel(
+            model_name=model_name,
+            system_instruction=system_instruction,
+            **_GOOGLE_MODEL_OPTIONS
+        )
+        return model, True
+    except Exception as e:
+        logger.error(f"Error creating Gemini model: {e}")
+        # Fallback for older versions or other issues; the instruction then
+        # has to be sent with every prompt
+        return genai.GenerativeModel(model_name=model_name), False
+
+
+@functools.lru_cache(maxsize=8)
+def _get_openai_client(api_key: str) -> OpenAI:
+    """
+    Get an OpenAI client for an API key.
+    
+    Cached so every extractor using the same key shares one client and its
+    pooled HTTP connections.
+    """
+    return OpenAI(api_key=api_key)
+
+
+@functools.lru_cache(maxsize=4)
+def _get_ollama_client(base_url: str) -> OllamaClient:
+    """Get the OllamaClient (and its HTTP session) for a base URL, shared by all extractors."""
+    return OllamaClient(base_url=base_url)
+
+
+def _get_context_cached_google_model(model_name: str, system_instruction: str, prompt: str, api_key: str):
+    """
+    Get a Gemini model whose system instruction and prompt live in a server-side context cache.
+    
+    The fixed prefix is then billed and processed once per cache lifetime instead
+    of with every invoice. Caches are refreshed shortly before they expire.
+    
+    Returns:
+        GenerativeModel bound to the cached prefix, or None if the prefix could
+        not be cached (e.g. it is shorter than the API's minimum cacheable size)
+    """
+    key = (api_key, model_name, system_instruction, prompt)
+    now = datetime.now()
+    
+    with _context_caches_lock:
+        cached, expires_at = _context_caches.get(key, (None, now))
+        if expires_at - now > timedelta(minutes=5):
+            if cached is None:
+                return None
+            return genai.GenerativeModel.from_cached_content(cached, **_GOOGLE_MODEL_OPTIONS)
+        
+        ttl = timedelta(minutes=Config.GEMINI_CONTEXT_CACHE_TTL_MINUTES)
+        try:
+            cached = caching.CachedContent.create(
+                model=model_name,
+                display_name="invoice-extraction-prompt",
+                system_instruction=system_instruction,
+                contents=[prompt],
+                ttl=ttl
+            )
+            logger.info(f"Created Gemini context cache for {model_name}")
+        except Exception as e:
+            # Don't retry on every invoice; try again when this entry expires
+            logger.warning(f"Gemini context caching unavailable, sending full prompts: {e}")
+            cached = None
+        
+        _context_caches[key] = (cached, now + ttl)
+        if cached is None:
+            return None
+        return genai.GenerativeModel.from_cached_content(cached, **_GOOGLE_MODEL_OPTIONS)
+
+
+_JSON_DECODER = json.JSONDecoder()
+
+
+def _has_complete_json(text: str) -> bool:
+    """
+    Check whether streamed model output already contains a complete JSON value.
+    
+    Used to stop streaming generation once the requested object or array has
+    been closed, instead of waiting for trailing tokens.
+    """
+    if not text.rstrip().endswith(("}", "]")):
+        return False
+    
+    starts = [pos for pos in (text.find("{"), text.find("[")) if pos != -1]
+    if not starts:
+        return False
+    try:
+        _JSON_DECODER.raw_decode(text, min(starts))
+    except ValueError:
+        return False
+    return True
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimate the token count of text (about 4 characters per token)."""
+    return len(text) // 4 + 1
+
+
 class InvoiceExtractor:
     """Extracts structured data from invoice text using various LLM providers."""
     
@@ -25,17 +222,15 @@ class InvoiceExtractor:
     the information from the document accurately and precisely.
     """
     
-    EXTRACTION_PROMPT = """Extract the company name, invoice date, and total amount from the invoice. 
-    Only return the required information without adding extra words or sentences.
-    The output should strictly follow this format:
-    Company name: <company_name> Invoice date: <invoice_date> Total amount: <total_amount>
-
-    Ensure:
-    - The company name is enclosed within `Company name:`
-    - The invoice date is enclosed within `Invoice date:`
-    - The total amount is enclosed within `Total amount:`
-    - No extra text or comments are included.
-    - Use the exact field names and order as provided above.
+    EXTRACTION_PROMPT = """Extract the invoice's company name, invoice date, and total amount.
+    Return only this JSON object, using null for missing values:
+    {"company_name": str, "invoice_date": "DD-MM-YYYY", "total_amount": number}
+    """
+    
+    BATCH_EXTRACTION_PROMPT = """Each invoice below starts with a `--- INVOICE <n> ---` delimiter.
+    Extract every invoice's company name, invoice date, and total amount.
+    Return only this JSON object, with one entry per invoice in order, using null for missing values:
+    {"invoices": [{"invoice": <n>, "company_name": str, "invoice_date": "DD-MM-YYYY", "total_amount": number}]}
     """
     
     def __init__(self, provider: str = None, model_name: str = None, api_key: str = None):
@@ -50,6 +245,8 @@ class InvoiceExtractor:
         self.provider = provider or Config.DEFAULT_PROVIDER
         self.model_name = model_name or Config.LLM_MODEL
         self.api_key = api_key
+        # Set once the Gemini model is built with the system instruction attached
+        self._system_in_model = False
         
         self.logger = logger
         self.logger.info(f"Initializing Invoice Extractor with provider: {self.provider}, model: {self.model_name}")
@@ -63,19 +260,19 @@ class InvoiceExtractor:
             if self.provider == 'google':
                 key = self.api_key or Config.GOOGLE_API_KEY
                 if key:
-                    genai.configure(api_key=key)
-                    self.client = self._create_google_model()
+                    _configure_google(key)
+                    self.client = self._create_google_model(key)
                 else:
                     self.client = None
                     self.logger.warning("Google API key not provided")
             
             elif self.provider == 'ollama':
-                self.client = OllamaClient(base_url=Config.OLLAMA_BASE_URL)
+                self.client = _get_ollama_client(Config.OLLAMA_BASE_URL)
                 
             elif self.provider == 'openai':
                 key = self.api_key or Config.OPENAI_API_KEY
                 if key:
-                    self.client = OpenAI(api_key=key)
+                    self.client = _get_openai_client(key)
                 else:
                     self.client = None
                     self.logger.warning("OpenAI API key not provided")
@@ -87,22 +284,10 @@ class InvoiceExtractor:
             self.logger.error(f"Failed to setup provider {self.provider}: {e}")
             self.client = None
 
-    def _create_google_model(self):
-        """Create and configure the Google GenerativeModel."""
-        try:
-            return genai.GenerativeModel(
-                model_name=self.model_name,
-                generation_config=Config.get_generation_config(),
-                system_instruction=self.SYSTEM_INSTRUCTION,
-                safety_settings={
-                    HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_LOW_AND_ABOVE,
-                    HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_LOW_AND_ABOVE,
-                }
-            )
-        except Exception as e:
-            self.logger.error(f"Error creating Gemini model: {e}")
-            # Fallback for older versions or other issues
-            return genai.GenerativeModel(model_name=self.model_name)
+    def _create_google_model(self, api_key: str):
+        """Get the Google GenerativeModel for the selected model and API key."""
+        model, self._system_in_model = _get_google_model(self.model_name, self.SYSTEM_INSTRUCTION, api_key)
+        return model
 
     def extract_invoice_data(self, invoice_text: str) -> Dict[str, str]:
         """
@@ -114,6 +299,62 @@ class InvoiceExtractor:
         Returns:
             Dictionary with company_name, invoice_date, and total_amount
         """
+        if Config.RULE_BASED_EXTRACTION:
+            fields = extract_invoice_fields(invoice_text)
+            if fields:
+                return fields
+        
+        cached = self._get_cached_response(invoice_text)
+        if cached is not None:
+            return cached
+        
+        fields = self._extract_with_llm(invoice_text)
+        self._cache_response(invoice_text, fields)
+        return fields
+
+    @property
+    def cache_key(self) -> str:
+        """Identifier for extractions made by this provider, model, and prompt version."""
+        return f"{self.provider}:{self.model_name}:v{PROMPT_VERSION}"
+
+    def _response_cache_key(self, invoice_text: str) -> str:
+        """Hash the invoice text together with the provider, model, and prompt version."""
+        return content_hash(f"{self.cache_key}|{invoice_text}".encode('utf-8'))
+
+    def _get_cached_response(self, invoice_text: str) -> Optional[Dict[str, str]]:
+        """Return a previous LLM extraction of the same text, if it hasn't expired."""
+        if Config.LLM_CACHE_SIZE <= 0:
+            return None
+        
+        key = self._response_cache_key(invoice_text)
+        with _response_cache_lock:
+            entry = _response_cache.get(key)
+            if entry is None:
+                return None
+            fields, expires_at = entry
+            if expires_at <= time.monotonic():
+                del _response_cache[key]
+                return None
+            _response_cache.move_to_end(key)
+        
+        self.logger.info("Reusing cached extraction for identical invoice text")
+        return dict(fields)
+
+    def _cache_response(self, invoice_text: str, fields: Dict[str, str]) -> None:
+        """Remember an LLM extraction. Failed extractions are not cached."""
+        if Config.LLM_CACHE_SIZE <= 0 or all(value == "Unknown" for value in fields.values()):
+            return
+        
+        key = self._response_cache_key(invoice_text)
+        expires_at = time.monotonic() + Config.LLM_CACHE_TTL_SECONDS
+        with _response_cache_lock:
+            _response_cache[key] = (dict(fields), expires_at)
+            _response_cache.move_to_end(key)
+            while len(_response_cache) > Config.LLM_CACHE_SIZE:
+                _response_cache.popitem(last=False)
+
+    def _extract_with_llm(self, invoice_text: str) -> Dict[str, str]:
+        """Extract one invoice with the selected provider."""
         if not self.client:
             self.logger.error(f"Client not initialized for provider: {self.provider}")
             return self._get_default_data()
@@ -121,29 +362,174 @@ class InvoiceExtractor:
         try:
             self.logger.info(f"Extracting data using {self.provider} ({self.model_name})")
             
-            if self.provider == 'google':
-                return self._generate_with_google(invoice_text)
-            elif self.provider == 'ollama':
-                return self._generate_with_ollama(invoice_text)
-            elif self.provider == 'openai':
-                return self._generate_with_openai(invoice_text)
-            
+            llm_output = self._generate(self.EXTRACTION_PROMPT, invoice_text)
+            if llm_output:
+                return self._parse_llm_output(llm_output)
             return self._get_default_data()
             
         except Exception as e:
             self.logger.error(f"Extraction failed: {e}")
             return self._get_default_data()
 
-    def _generate_with_google(self, invoice_text: str) -> Dict[str, str]:
+    def extract_invoice_data_batch(self, invoice_texts: List[str]) -> List[Dict[str, str]]:
+        """
+        Extract structured data for several invoices with as few LLM calls as possible.
+        
+        Invoices whose fields can all be found with rules, or whose text was
+        extracted recently, skip the LLM. The rest are packed into batches of at
+        most Config.LLM_BATCH_SIZE invoices that fit the model's context window,
+        and each batch is sent as a single prompt. Invoices missing from a batch response are retried individually.
+        
+        Args:
+            invoice_texts: Raw text extracted from each invoice
+            
+        Returns:
+            List of dictionaries with company_name, invoice_date, and total_amount,
+            in the same order as invoice_texts
+        """
+        results = [
+            extract_invoice_fields(text) if Config.RULE_BASED_EXTRACTION else None
+            for text in invoice_texts
+        ]
+        for idx, fields in enumerate(results):
+            if fields is None:
+                results[idx] = self._get_cached_response(invoice_texts[idx])
+        pending = [idx for idx, fields in enumerate(results) if fields is None]
+        if not pending:
+            return results
+        
+        if not self.client:
+            self.logger.error(f"Client not initialized for provider: {self.provider}")
+            for idx in pending:
+                results[idx] = self._get_default_data()
+            return results
+        
+        batches = self._pack_batches(pending, invoice_texts)
+        workers = min(max(1, Config.LLM_CONCURRENCY), len(batches))
+        # Requests are network-bound, so batches are sent concurrently
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            extracted_batches = executor.map(
+                lambda batch: self._extract_batch([invoice_texts[idx] for idx in batch]),
+                batches
+            )
+            for batch, extracted in zip(batches, extracted_batches):
+                for idx, fields in zip(batch, extracted):
+                    results[idx] = fields
+                    self._cache_response(invoice_texts[idx], fields)
+        return results
+
+    def _pack_batches(self, indices: List[int], invoice_texts: List[str]) -> List[List[int]]:
+        """
+        Greedily group invoices into batches that fit the context window.
+        
+        The input budget is Config.LLM_CONTEXT_TOKENS minus the instruction and
+        batch prompt, and minus Config.LLM_MAX_OUTPUT_TOKENS reserved for the
+        response. An invoice that doesn't fit any batch is sent on its own.
+        
+        Args:
+            indices: Positions in invoice_texts to pack, in order
+            invoice_texts: All invoice texts
+            
+        Returns:
+            Lists of positions, one per LLM request
+        """
+        budget = (
+            Config.LLM_CONTEXT_TOKENS
+            - estimate_tokens(self.SYSTEM_INSTRUCTION + self.BATCH_EXTRACTION_PROMPT)
+            - Config.LLM_MAX_OUTPUT_TOKENS
+        )
+        batch_size = max(1, Config.LLM_BATCH_SIZE)
+        
+        batches = []
+        batch = []
+        used = 0
+        for idx in indices:
+            # The delimiter line adds a few tokens per invoice
+            tokens = estimate_tokens(invoice_texts[idx]) + 8
+            if batch and (len(batch) >= batch_size or used + tokens > budget):
+                batches.append(batch)
+                batch = []
+                used = 0
+            batch.append(idx)
+            used += tokens
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _extract_batch(self, invoice_texts: List[str]) -> List[Dict[str, str]]:
+        """Extract one batch of invoices in a single LLM call."""
+        if len(invoice_texts) == 1:
+            return [self._extract_with_llm(invoice_texts[0])]
+        
+        parsed = {}
+        try:
+            self.logger.info(
+                f"Extracting {len(invoice_texts)} invoices in one request "
+                f"using {self.provider} ({self.model_name})"
+            )
+            llm_output = self._generate(
+                self.BATCH_EXTRACTION_PROMPT,
+                self._build_batch_text(invoice_texts)
+            )
+            if llm_output:
+                parsed = self._parse_batch_output(llm_output)
+        except Exception as e:
+            self.logger.error(f"Batch extraction failed: {e}")
+        
+        results = []
+        for number, invoice_text in enumerate(invoice_texts, 1):
+            if number in parsed:
+                results.append(parsed[number])
+            else:
+                self.logger.warning(f"Invoice {number} missing from batch response, retrying alone")
+                results.append(self._extract_with_llm(invoice_text))
+        return results
+
+    @staticmethod
+    def _build_batch_text(invoice_texts: List[str]) -> str:
+        """Join invoice texts with numbered delimiters."""
+        return "\n\n".join(
+            f"--- INVOICE {number} ---\n{text}"
+            for number, text in enumerate(invoice_texts, 1)
+        )
+
+    def _generate(self, prompt: str, invoice_text: str) -> Optional[str]:
+        """
+        Send a prompt and invoice text to the selected provider.
+        
+        Returns:
+            Raw model output or None if the provider returned nothing
+        """
+        if self.provider == 'google':
+            return self._generate_with_google(prompt, invoice_text)
+        elif self.provider == 'ollama':
+            return self._generate_with_ollama(prompt, invoice_text)
+        elif self.provider == 'openai':
+            return self._generate_with_openai(prompt, invoice_text)
+        return None
+
+    def _generate_with_google(self, prompt: str, invoice_text: str) -> Optional[str]:
         """Generate content using Google Gemini."""
-        full_prompt = f"{self.SYSTEM_INSTRUCTION}\n\n{self.EXTRACTION_PROMPT}\n\nInvoice Text:\n{invoice_text}"
-        response = self.client.generate_content(full_prompt)
+        model = None
+        if Config.GEMINI_CONTEXT_CACHE and caching is not None:
+            model = _get_context_cached_google_model(
+                self.model_name, self.SYSTEM_INSTRUCTION, prompt, self.api_key or Config.GOOGLE_API_KEY
+            )
+        
+        if model is not None:
+            # Instruction and prompt are already in the cached context
+            response = model.generate_content(f"Invoice Text:\n{invoice_text}")
+        else:
+            full_prompt = f"{prompt}\n\nInvoice Text:\n{invoice_text}"
+            if not self._system_in_model:
+                full_prompt = f"{self.SYSTEM_INSTRUCTION}\n\n{full_prompt}"
+            response = self.client.generate_content(full_prompt)
         
         if response and response.text:
-            return self._parse_llm_output(response.text)
-        return self._get_default_data()
+            return response.text
+        return None
 
-    def _generate_with_ollama(self, invoice_text: str) -> Dict[str, str]:
+    def _generate_with_ollama(self, prompt: str, invoice_text: str) -> Optional[str]:
         """Generate content using local Ollama model."""
         options = {
             "temperature": Config.LLM_TEMPERATURE,
@@ -152,54 +538,119 @@ class InvoiceExtractor:
             "num_predict": Config.LLM_MAX_OUTPUT_TOKENS
         }
         
-        response = self.client.generate(
+        return self.client.generate(
             model=self.model_name,
-            prompt=f"{self.EXTRACTION_PROMPT}\n\nInvoice Text:\n{invoice_text}",
+            prompt=f"{prompt}\n\nInvoice Text:\n{invoice_text}",
             system=self.SYSTEM_INSTRUCTION,
-            options=options
+            options=options,
+            json_mode=True,
+            stop_when=_has_complete_json
         )
-        
-        if response:
-            return self._parse_llm_output(response)
-        return self._get_default_data()
 
-    def _generate_with_openai(self, invoice_text: str) -> Dict[str, str]:
+    def _generate_with_openai(self, prompt: str, invoice_text: str) -> Optional[str]:
         """Generate content using OpenAI GPT models."""
         response = self.client.chat.completions.create(
             model=self.model_name,
             messages=[
                 {"role": "system", "content": self.SYSTEM_INSTRUCTION},
-                {"role": "user", "content": f"{self.EXTRACTION_PROMPT}\n\nInvoice Text:\n{invoice_text}"}
+                {"role": "user", "content": f"{prompt}\n\nInvoice Text:\n{invoice_text}"}
             ],
             temperature=Config.LLM_TEMPERATURE,
-            max_tokens=Config.LLM_MAX_OUTPUT_TOKENS
+            max_tokens=Config.LLM_MAX_OUTPUT_TOKENS,
+            # JSON mode guarantees a parseable object and no surrounding prose
+            response_format={"type": "json_object"}
         )
         
         if response and response.choices:
-            return self._parse_llm_output(response.choices[0].message.content)
-        return self._get_default_data()
+            return response.choices[0].message.content
+        return None
 
     def _parse_llm_output(self, llm_output: str) -> Dict[str, str]:
         """Parse LLM output to extract structured data."""
         self.logger.debug(f"Parsing LLM output: {llm_output}")
         
-        # Regex patterns to match the expected format
-        patterns = {
-            'company_name': r"Company name:\s*([^\n]+?)\s*Invoice date:",
-            'invoice_date': r"Invoice date:\s*([^\n]+?)\s*Total amount:",
-            'total_amount': r"Total amount:\s*([^\n]+?)(?:\n|$)"
-        }
+        data = self._load_json(llm_output)
+        if isinstance(data, list) and data:
+            data = data[0]
+        if isinstance(data, dict):
+            return self._normalize_fields(data)
+        
+        # Fall back to the labelled "Company name: ... Invoice date: ..." format
+        match = _LABELLED_FIELDS_RE.search(llm_output)
+        if match:
+            return self._normalize_fields(match.groupdict())
         
         results = {}
-        for field, pattern in patterns.items():
-            match = re.search(pattern, llm_output, re.IGNORECASE)
-            results[field] = match.group(1).strip() if match else "Unknown"
+        for field, pattern in _FIELD_PATTERNS.items():
+            match = pattern.search(llm_output)
+            results[field] = match.group(1) if match else None
+        return self._normalize_fields(results)
+
+    def _parse_batch_output(self, llm_output: str) -> Dict[int, Dict[str, str]]:
+        """
+        Parse a batch response into per-invoice results.
+        
+        Returns:
+            Mapping of invoice number (1-based) to extracted data
+        """
+        self.logger.debug(f"Parsing batch LLM output: {llm_output}")
+        
+        data = self._load_json(llm_output)
+        if isinstance(data, dict):
+            # {"invoices": [...]} as requested, or a lone invoice object
+            data = data['invoices'] if isinstance(data.get('invoices'), list) else [data]
+        if isinstance(data, list):
+            results = {}
+            for position, item in enumerate(data, 1):
+                if not isinstance(item, dict):
+                    continue
+                try:
+                    number = int(item.get('invoice', position))
+                except (TypeError, ValueError):
+                    number = position
+                results[number] = self._normalize_fields(item)
+            return results
+        
+        # Fall back to splitting the response at each "Invoice <n>:" marker
+        markers = list(_BATCH_MARKER_RE.finditer(llm_output))
+        results = {}
+        for i, marker in enumerate(markers):
+            end = markers[i + 1].start() if i + 1 < len(markers) else len(llm_output)
+            results[int(marker.group(1))] = self._parse_llm_output(llm_output[marker.end():end])
+        return results
+
+    @staticmethod
+    def _load_json(llm_output: str) -> Any:
+        """
+        Decode JSON from LLM output, tolerating markdown code fences.
+        
+        Returns:
+            Decoded JSON value, or None if the output is not valid JSON
+        """
+        text = llm_output.strip()
+        if text.startswith("```"):
+            text = text.strip("`")
+            if text.lower().startswith("json"):
+                text = text[4:]
+        try:
+            return json.loads(text)
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _normalize_fields(data: Dict[str, Any]) -> Dict[str, str]:
+        """Convert raw extracted values to the string fields used by the UI."""
+        results = {}
+        for field in ('company_name', 'invoice_date', 'total_amount'):
+            value = data.get(field)
+            value = str(value).strip() if value is not None else ""
+            results[field] = value or "Unknown"
         
-        # Clean up total amount
+        # Clean up total amount (currency symbols, thousands and decimal separators)
         if results['total_amount'] != "Unknown":
-            amount_numeric = re.search(r"([\d,]+\.?\d*)", results['total_amount'])
-            if amount_numeric:
-                results['total_amount'] = amount_numeric.group(1).replace(",", "")
+            amount = AmountParser.parse_amount(results['total_amount'])
+            if amount is not None:
+                results['total_amount'] = f"{amount:.2f}"
         
         return results
 
@@ -245,7 +696,7 @@ class InvoiceExtractor:
             if not key:
                 return []
             
-            genai.configure(api_key=key)
+            _configure_google(key)
             models = []
             for m in genai.list_models():
                 if 'generateContent' in m.supported_generation_methods:
@@ -265,7 +716,7 @@ class InvoiceExtractor:
                 return []
             
             if not self.client:
-                self.client = OpenAI(api_key=key)
+                self.client = _get_openai_client(key)
                 
             models = self.client.models.list()
             # Filter for chat-compatible models
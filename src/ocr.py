@@ -1,35 +1,341 @@
 """
 OCR processing module for Invoice Data Extractor.
-Handles PDF text extraction using Tesseract OCR.
+Handles PDF text extraction using Tesseract OCR, or optionally PaddleOCR.
 """
+import numpy as np
 import pytesseract
 from PIL import Image
-from pdf2image import convert_from_path
-from typing import List, Optional
+from pdf2image import convert_from_path, pdfinfo_from_path
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple, Union
 from pathlib import Path
+import functools
+import io
+import os
+import re
 import tempfile
+import threading
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:  # Optional: faster text layer extraction than pdfplumber
+    fitz = None
+
+try:
+    import pdfplumber
+except ImportError:  # Optional: without it (or PyMuPDF) every PDF goes through OCR
+    pdfplumber = None
+
+try:
+    import cv2
+except ImportError:  # Optional: without it pages are handed to Tesseract as rendered
+    cv2 = None
+
+try:
+    import tesserocr
+except ImportError:  # Optional: falls back to the pytesseract subprocess wrapper
+    tesserocr = None
+
+try:
+    from paddleocr import PaddleOCR
+except ImportError:  # Optional: OCR_BACKEND=paddle falls back to Tesseract
+    PaddleOCR = None
 
 from config import Config
 from src.logger import setup_logger
+from src.utils import content_hash
 
 logger = setup_logger(__name__)
 
 # Configure Tesseract
 pytesseract.pytesseract.tesseract_cmd = Config.TESSERACT_CMD
 
+# Glyphs without a Unicode mapping, as rendered by pdfplumber
+_CID_RE = re.compile(r"\(cid:\d+\)")
+# Text layers with a smaller share of readable characters are treated as
+# garbage (broken font encodings) and the PDF is OCR'd instead
+_MIN_READABLE_RATIO = 0.7
+
+# Fixed-threshold lookup table used to binarize pages when OpenCV is unavailable
+_BINARIZE_THRESHOLD = 180
+_BINARIZE_TABLE = [0 if level < _BINARIZE_THRESHOLD else 255 for level in range(256)]
+
+# Deskew searches rotations up to this many degrees either way, in fixed steps,
+# on a copy of the page downscaled to at most this many pixels per side
+_DESKEW_MAX_ANGLE = 5.0
+_DESKEW_STEP = 0.25
+_DESKEW_MAX_SIDE = 1000
+
+# tesserocr API handles are not thread-safe, so each thread gets its own
+_tesserocr_state = threading.local()
+
+
+# One PaddleOCR model for the whole process; inference on it is serialized
+_paddle_ocr = None
+_paddle_lock = threading.Lock()
+
+
+def _paddle_enabled() -> bool:
+    """Check whether pages should be OCR'd with PaddleOCR instead of Tesseract."""
+    return Config.OCR_BACKEND == 'paddle' and PaddleOCR is not None
+
+
+def _ocr_image_paddle(image: Image.Image) -> Tuple[str, Optional[int]]:
+    """
+    OCR a PIL image with PaddleOCR.
+    
+    The model is loaded on first use. Pages share one model (and one GPU), so
+    recognition runs one page at a time while other workers keep rendering.
+    
+    Args:
+        image: Page image
+        
+    Returns:
+        Tuple of (extracted text, mean line confidence 0-100)
+    """
+    global _paddle_ocr
+    pixels = np.asarray(image.convert('RGB'))
+    
+    with _paddle_lock:
+        if _paddle_ocr is None:
+            _paddle_ocr = PaddleOCR(
+                use_angle_cls=False,
+                lang='en',
+                use_gpu=Config.OCR_USE_GPU,
+                det_db_thresh=0.3,
+                show_log=False
+            )
+            logger.info(f"PaddleOCR model loaded (use_gpu={Config.OCR_USE_GPU})")
+        result = _paddle_ocr.ocr(pixels, cls=False)
+    
+    # One entry per image, each a list of [box, (text, confidence)] lines
+    lines = (result[0] if result else None) or []
+    if not lines:
+        return "", 0
+    
+    text = "\n".join(line[1][0] for line in lines)
+    confidence = round(100 * sum(line[1][1] for line in lines) / len(lines))
+    return text, confidence
+
+
+def _tesseract_option(name: str, default: int) -> int:
+    """Read a numeric option such as --psm from Config.TESSERACT_CONFIG."""
+    match = re.search(rf"--{name}\s+(\d+)", Config.TESSERACT_CONFIG)
+    return int(match.group(1)) if match else default
+
+
+def _is_readable_text(text: str) -> bool:
+    """
+    Check that an embedded text layer is mostly real characters.
+    
+    PDFs with broken font encodings yield unmapped glyphs, replacement or
+    private-use characters instead of text; those still need OCR.
+    """
+    text = _CID_RE.sub("\ufffd", "".join(text.split()))
+    if not text:
+        return False
+    
+    readable = sum(
+        1 for char in text
+        if char.isprintable() and char != "\ufffd" and not "\ue000" <= char <= "\uf8ff"
+    )
+    return readable / len(text) >= _MIN_READABLE_RATIO
+
+
+def _tesseract_variables() -> List[Tuple[str, str]]:
+    """Read "-c name=value" variables from Config.TESSERACT_CONFIG."""
+    return re.findall(r"-c\s+(\w+)=(\S+)", Config.TESSERACT_CONFIG)
+
+
+def _get_tesserocr_api():
+    """
+    Get the tesserocr API for the current thread, creating it on first use.
+    
+    Loading the language model is the expensive part, so the handle is reused
+    for every page this thread OCRs.
+    """
+    api = getattr(_tesserocr_state, 'api', None)
+    if api is None:
+        api = tesserocr.PyTessBaseAPI(
+            lang=Config.OCR_LANGUAGE,
+            psm=_tesseract_option('psm', tesserocr.PSM.AUTO),
+            oem=_tesseract_option('oem', tesserocr.OEM.DEFAULT)
+        )
+        for name, value in _tesseract_variables():
+            api.SetVariable(name, value)
+        _tesserocr_state.api = api
+    return api
+
+
+def _rotate(image: np.ndarray, angle: float, background: int) -> np.ndarray:
+    """Rotate an image array about its center by angle degrees (counterclockwise)."""
+    height, width = image.shape
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return cv2.warpAffine(
+        image, matrix, (width, height),
+        flags=cv2.INTER_NEAREST,
+        borderMode=cv2.BORDER_CONSTANT,
+        borderValue=background
+    )
+
+
+def _estimate_skew(bw: np.ndarray) -> float:
+    """
+    Estimate the rotation that makes the text lines of a binarized page horizontal.
+    
+    Uses the horizontal projection profile: when the lines are level, ink
+    piles up in a few rows and the row sums change sharply between text and
+    gaps. Unlike a bounding box around all ink, this follows the text lines
+    themselves, so lines sticking out past a table don't read as skew.
+    
+    Args:
+        bw: Binarized page, black text on white
+        
+    Returns:
+        Angle in degrees to rotate the page by, or 0.0 if it is already level
+    """
+    ink = 255 - bw
+    scale = _DESKEW_MAX_SIDE / max(ink.shape)
+    if scale < 1:
+        ink = cv2.resize(ink, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    
+    def sharpness(angle: float) -> float:
+        profile = _rotate(ink, angle, 0).sum(axis=1, dtype=np.float64)
+        return float(np.square(np.diff(profile)).sum())
+    
+    steps = int(_DESKEW_MAX_ANGLE / _DESKEW_STEP)
+    angles = [step * _DESKEW_STEP for step in range(-steps, steps + 1)]
+    # max() keeps the first of equal scores, so try level first
+    angles.sort(key=abs)
+    return max(angles, key=sharpness)
+
+
+def _preprocess_image(image: Image.Image) -> Image.Image:
+    """
+    Binarize (and optionally deskew) a page image before OCR.
+    
+    Tesseract otherwise runs its own (slower, scalar) thresholding on every
+    page; a clean bilevel image is both faster and more accurate to recognize.
+    Without OpenCV, pages are binarized with a fixed threshold and not deskewed.
+    
+    Args:
+        image: Page image
+        
+    Returns:
+        Binarized (and, with OCR_DESKEW and OpenCV, deskewed) image
+    """
+    if not Config.OCR_PREPROCESS:
+        return image
+    if cv2 is None:
+        return image.convert('L').point(_BINARIZE_TABLE, mode='1')
+    
+    gray = np.asarray(image.convert('L'))
+    _, bw = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    
+    if Config.OCR_DESKEW:
+        angle = _estimate_skew(bw)
+        if angle:
+            bw = _rotate(bw, angle, 255)
+    
+    return Image.fromarray(bw)
+
+
+def _needs_fallback_pass(text: str, confidence: Optional[int]) -> bool:
+    """
+    Check whether a page should be OCR'd again at Config.OCR_FALLBACK_DPI.
+    
+    Blank pages (e.g. scanned back sides) report zero confidence too, but a
+    sharper render of nothing finds nothing, so they are not retried.
+    """
+    return (
+        confidence is not None
+        and confidence < Config.OCR_MIN_CONFIDENCE
+        and Config.OCR_FALLBACK_DPI > Config.OCR_DPI
+        and bool(text.strip())
+    )
+
+
+def _ocr_image(image: Image.Image) -> Tuple[str, Optional[int]]:
+    """
+    OCR a PIL image.
+    
+    Uses PaddleOCR when selected with OCR_BACKEND=paddle. Otherwise uses the
+    in-process tesserocr API when installed, avoiding a tesseract subprocess
+    per page, or pytesseract.
+    
+    Args:
+        image: Page image
+        
+    Returns:
+        Tuple of (extracted text, mean word confidence 0-100). The confidence
+        is None with pytesseract, which would need a second OCR pass for it.
+    """
+    if _paddle_enabled():
+        return _ocr_image_paddle(image)
+    
+    image = _preprocess_image(image)
+    
+    if tesserocr is not None:
+        api = _get_tesserocr_api()
+        api.SetImage(image)
+        return api.GetUTF8Text(), api.MeanTextConf()
+    
+    text = pytesseract.image_to_string(
+        image,
+        lang=Config.OCR_LANGUAGE,
+        config=Config.TESSERACT_CONFIG
+    )
+    return text, None
+
+
+def _ocr_image_file(image_path: str) -> Tuple[str, Optional[int]]:
+    """
+    OCR a single rendered page image.
+    
+    Pages are rendered to disk and opened one at a time, so each worker
+    holds at most one decoded page image in memory.
+    
+    Args:
+        image_path: Path to the rendered page image
+        
+    Returns:
+        Tuple of (extracted text, mean confidence or None) for the page
+    """
+    with Image.open(image_path) as image:
+        return _ocr_image(image)
+
 
 class OCRProcessor:
     """Handles OCR processing for invoice PDFs."""
     
-    def __init__(self, max_pages: int = None):
+    def __init__(self, max_pages: int = None, max_workers: int = None):
         """
         Initialize OCR processor.
         
         Args:
             max_pages: Maximum number of pages to process per PDF
+            max_workers: Maximum number of worker threads used for page OCR
         """
         self.max_pages = max_pages or Config.MAX_PAGES_PER_PDF
-        logger.info(f"OCR Processor initialized with max_pages={self.max_pages}")
+        self.max_workers = max_workers or Config.OCR_WORKERS
+        
+        # Recently extracted text keyed by PDF content hash. Streamlit reruns the
+        # whole script on every widget change, so the same bytes arrive repeatedly.
+        self._text_cache = OrderedDict()
+        self._text_cache_lock = threading.Lock()
+        
+        # Page OCR threads live as long as the processor, so their tesserocr
+        # handles (and loaded models) are reused across PDFs
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        
+        if Config.OCR_BACKEND == 'paddle' and PaddleOCR is None:
+            logger.warning("OCR_BACKEND is 'paddle' but paddleocr is not installed, using Tesseract")
+        logger.info(
+            f"OCR Processor initialized with max_pages={self.max_pages}, "
+            f"max_workers={self.max_workers}"
+        )
     
     def extract_text_from_pdf(self, pdf_path: str) -> str:
         """
@@ -51,24 +357,241 @@ class OCRProcessor:
         
         try:
             logger.info(f"Converting PDF to images: {pdf_path}")
-            pages = convert_from_path(pdf_path)
-            extracted_text = ""
+            extracted_text = self._extract_text(pdf_path)
+            logger.info(f"Successfully extracted {len(extracted_text)} characters")
+            return extracted_text
             
-            pages_to_process = min(len(pages), self.max_pages)
-            logger.info(f"Processing {pages_to_process} pages")
+        except Exception as e:
+            logger.error(f"OCR processing failed for {pdf_path}: {e}")
+            raise Exception(f"OCR processing failed: {e}")
+    
+    def extract_text_from_pdf_bytes(self, pdf_bytes: bytes) -> str:
+        """
+        Extract text from in-memory PDF bytes using OCR.
+        
+        Born-digital PDFs are read from memory. Scanned PDFs are written once to
+        a private temporary directory for Poppler to render from.
+        
+        Args:
+            pdf_bytes: Raw PDF file bytes
             
-            for page_num, page in enumerate(pages[:pages_to_process], 1):
-                logger.debug(f"Processing page {page_num}/{pages_to_process}")
-                text = pytesseract.image_to_string(page)
-                extracted_text += text + "\n"
+        Returns:
+            Extracted text from all pages
             
+        Raises:
+            Exception: If OCR processing fails
+        """
+        key = content_hash(pdf_bytes)
+        with self._text_cache_lock:
+            if key in self._text_cache:
+                self._text_cache.move_to_end(key)
+                logger.info("Using cached OCR text for PDF bytes")
+                return self._text_cache[key]
+        
+        try:
+            logger.info(f"Converting PDF bytes to images ({len(pdf_bytes)} bytes)")
+            extracted_text = self._extract_text(pdf_bytes)
             logger.info(f"Successfully extracted {len(extracted_text)} characters")
+            
+            with self._text_cache_lock:
+                self._text_cache[key] = extracted_text
+                while len(self._text_cache) > Config.OCR_CACHE_SIZE:
+                    self._text_cache.popitem(last=False)
             return extracted_text
             
         except Exception as e:
-            logger.error(f"OCR processing failed for {pdf_path}: {e}")
+            logger.error(f"OCR processing failed for PDF bytes: {e}")
             raise Exception(f"OCR processing failed: {e}")
     
+    def _extract_text(self, source: Union[str, bytes]) -> str:
+        """
+        Extract text from a PDF, via its text layer or by rendering and OCR'ing its pages.
+        
+        Args:
+            source: PDF path or bytes
+            
+        Returns:
+            Extracted text from all pages
+        """
+        text = self._extract_text_layer(source)
+        if text is not None:
+            return text
+        
+        with tempfile.TemporaryDirectory() as work_dir:
+            pdf_path = source
+            if isinstance(source, bytes):
+                # pdf2image spools bytes to a temporary file on every call; write
+                # them once so each page render reads the same file
+                pdf_path = os.path.join(work_dir, 'source.pdf')
+                with open(pdf_path, 'wb') as pdf_file:
+                    pdf_file.write(source)
+            
+            # Pages beyond max_pages are never rendered
+            page_count = min(int(pdfinfo_from_path(pdf_path)['Pages']), self.max_pages)
+            results = self._ocr_pages(pdf_path, page_count, work_dir)
+            
+            texts = []
+            for page_number, (text, confidence) in enumerate(results, start=1):
+                if _needs_fallback_pass(text, confidence):
+                    text = self._reocr_page(pdf_path, page_number, text, confidence)
+                texts.append(text)
+        
+        return "\n".join(texts)
+    
+    def _reocr_page(self, pdf_path: str, page_number: int, text: str, confidence: int) -> str:
+        """
+        OCR a single page again at Config.OCR_FALLBACK_DPI.
+        
+        Pages are rendered at the lower Config.OCR_DPI by default; small or
+        dense print that Tesseract was unsure about gets a second, sharper pass.
+        
+        Args:
+            pdf_path: Path to the PDF
+            page_number: 1-based page number
+            text: Text from the first pass
+            confidence: Mean confidence of the first pass
+            
+        Returns:
+            Text of whichever pass had the higher confidence
+        """
+        logger.info(
+            f"Page {page_number} OCR confidence {confidence} is below "
+            f"{Config.OCR_MIN_CONFIDENCE}, retrying at {Config.OCR_FALLBACK_DPI} DPI"
+        )
+        images = convert_from_path(
+            pdf_path,
+            dpi=Config.OCR_FALLBACK_DPI,
+            grayscale=Config.OCR_GRAYSCALE,
+            first_page=page_number,
+            last_page=page_number
+        )
+        retry_text, retry_confidence = _ocr_image(images[0])
+        return retry_text if retry_confidence >= confidence else text
+    
+    def _extract_text_layer(self, source: Union[str, bytes]) -> Optional[str]:
+        """
+        Read the embedded text layer of a born-digital PDF.
+        
+        Args:
+            source: PDF path or bytes
+            
+        Returns:
+            The embedded text, or None if the PDF has no usable text layer
+            and needs OCR
+        """
+        try:
+            if fitz is not None:
+                text = self._read_text_layer_pymupdf(source)
+            elif pdfplumber is not None:
+                text = self._read_text_layer_pdfplumber(source)
+            else:
+                return None
+        except Exception as e:
+            logger.warning(f"Text layer extraction failed, falling back to OCR: {e}")
+            return None
+        
+        if len(text.strip()) < Config.TEXT_LAYER_MIN_CHARS:
+            return None
+        if not _is_readable_text(text):
+            logger.info("Embedded PDF text layer is unreadable, falling back to OCR")
+            return None
+        
+        logger.info("Using embedded PDF text layer, skipping OCR")
+        return text
+    
+    def _read_text_layer_pymupdf(self, source: Union[str, bytes]) -> str:
+        """Read the text layer of the first max_pages pages with PyMuPDF."""
+        if isinstance(source, bytes):
+            doc = fitz.open(stream=source, filetype="pdf")
+        else:
+            doc = fitz.open(source)
+        with doc:
+            return "\n".join(
+                doc[page_index].get_text("text")
+                for page_index in range(min(doc.page_count, self.max_pages))
+            )
+    
+    def _read_text_layer_pdfplumber(self, source: Union[str, bytes]) -> str:
+        """Read the text layer of the first max_pages pages with pdfplumber."""
+        pdf_source = io.BytesIO(source) if isinstance(source, bytes) else source
+        with pdfplumber.open(pdf_source) as pdf:
+            return "\n".join(
+                page.extract_text() or "" for page in pdf.pages[:self.max_pages]
+            )
+    
+    def _ocr_pages(self, pdf_path: str, page_count: int, work_dir: str) -> List[Tuple[str, Optional[int]]]:
+        """
+        Render and OCR pages in parallel, preserving page order.
+        
+        Each worker renders a single page and OCRs it straight away, so OCR of
+        the first pages overlaps with rendering of the later ones instead of
+        waiting for the whole document to be rasterized.
+        
+        Args:
+            pdf_path: Path to the PDF
+            page_count: Number of pages to process, starting at page 1
+            work_dir: Directory for the rendered page images
+            
+        Returns:
+            (text, confidence) for each page, in page order
+        """
+        workers = min(self.max_workers, page_count)
+        logger.info(f"Processing {page_count} pages with {workers} worker(s)")
+        
+        render_and_ocr = functools.partial(self._render_and_ocr_page, pdf_path, work_dir)
+        page_numbers = range(1, page_count + 1)
+        if workers <= 1:
+            return [render_and_ocr(page_number) for page_number in page_numbers]
+        
+        return list(self._get_executor().map(render_and_ocr, page_numbers))
+    
+    @staticmethod
+    def _render_and_ocr_page(pdf_path: str, work_dir: str, page_number: int) -> Tuple[str, Optional[int]]:
+        """
+        Render one page to disk and OCR it.
+        
+        The page image is deleted once read, so at most one rendered page per
+        worker exists at a time.
+        
+        Args:
+            pdf_path: Path to the PDF
+            work_dir: Directory for the rendered page image
+            page_number: 1-based page number
+            
+        Returns:
+            Tuple of (extracted text, mean confidence or None) for the page
+        """
+        page_paths = convert_from_path(
+            pdf_path,
+            output_folder=work_dir,
+            dpi=Config.OCR_DPI,
+            grayscale=Config.OCR_GRAYSCALE,
+            fmt='jpeg',
+            paths_only=True,
+            first_page=page_number,
+            last_page=page_number
+        )
+        try:
+            return _ocr_image_file(page_paths[0])
+        finally:
+            for path in page_paths:
+                Path(path).unlink(missing_ok=True)
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """
+        Get the shared page OCR thread pool, creating it on first use.
+        
+        Threads are enough here: the pytesseract subprocess and tesserocr's
+        native recognizer both run outside the GIL.
+        """
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="ocr"
+                )
+            return self._executor
+    
     def extract_text_from_image(self, image_path: str) -> str:
         """
         Extract text from image file.
@@ -80,8 +603,8 @@ class OCRProcessor:
             Extracted text
         """
         try:
-            image = Image.open(image_path)
-            text = pytesseract.image_to_string(image)
+            with Image.open(image_path) as image:
+                text, _ = _ocr_image(image)
             logger.info(f"Extracted text from image: {image_path}")
             return text
         except Exception as e:
@@ -99,26 +622,23 @@ class OCRProcessor:
         Returns:
             Extracted text
         """
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-            tmp_file.write(file_bytes)
-            tmp_path = tmp_file.name
-        
-        try:
-            text = self.extract_text_from_pdf(tmp_path)
-            return text
-        finally:
-            # Cleanup temporary file
-            Path(tmp_path).unlink(missing_ok=True)
+        logger.info(f"Processing uploaded file: {filename}")
+        return self.extract_text_from_pdf_bytes(file_bytes)
     
     @staticmethod
     def validate_tesseract_installation() -> bool:
         """
         Check if Tesseract is properly installed and accessible.
         
+        Tesseract is not required when the PaddleOCR backend is in use.
+        
         Returns:
-            True if Tesseract is available
+            True if Tesseract is available or not needed
         """
+        if _paddle_enabled():
+            logger.info("Using the PaddleOCR backend")
+            return True
+        
         try:
             pytesseract.get_tesseract_version()
             logger.info("Tesseract OCR is properly configured")
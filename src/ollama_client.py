@@ -3,12 +3,32 @@ Ollama API client for Invoice Data Extractor.
 Handles communication with local Ollama instance for text generation.
 """
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
-from typing import List, Dict, Any, Optional
+from typing import Callable, List, Dict, Any, Optional
 from src.logger import setup_logger
 
+try:
+    import orjson
+except ImportError:  # Optional: falls back to the standard library json module
+    orjson = None
+
 logger = setup_logger(__name__)
 
+
+def _json_loads(data: bytes) -> Any:
+    """Decode JSON bytes, with orjson when installed."""
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def _json_dumps(payload: Dict[str, Any]) -> bytes:
+    """Encode a request payload as UTF-8 JSON bytes, with orjson when installed."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload).encode('utf-8')
+
+
 class OllamaClient:
     """Client for interacting with local Ollama service."""
     
@@ -20,7 +40,31 @@ class OllamaClient:
             base_url: Base URL of the Ollama service (e.g., http://localhost:11434)
         """
         self.base_url = base_url.rstrip('/')
+        self.session = self._create_session()
         logger.info(f"Ollama client initialized with base URL: {self.base_url}")
+    
+    @staticmethod
+    def _create_session() -> requests.Session:
+        """
+        Create an HTTP session that keeps connections to Ollama alive.
+        
+        Requests reuse pooled connections instead of reconnecting each time, and
+        connection errors or 5xx responses (e.g. while Ollama restarts or loads a
+        model) are retried with backoff. Generation is safe to repeat, so POSTs
+        are retried as well.
+        """
+        retry = Retry(
+            total=3,
+            backoff_factor=0.2,
+            status_forcelist=[500, 502, 503, 504],
+            allowed_methods=frozenset({"GET", "POST"}),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=retry)
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
         
     def list_models(self) -> List[str]:
         """
@@ -31,9 +75,9 @@ class OllamaClient:
         """
         try:
             logger.debug(f"Fetching tags from {self.base_url}/api/tags")
-            response = requests.get(f"{self.base_url}/api/tags", timeout=5)
+            response = self.session.get(f"{self.base_url}/api/tags", timeout=5)
             if response.status_code == 200:
-                data = response.json()
+                data = _json_loads(response.content)
                 models = [model['name'] for model in data.get('models', [])]
                 logger.info(f"Found {len(models)} local Ollama models")
                 return models
@@ -44,15 +88,30 @@ class OllamaClient:
             logger.error(f"Error connecting to Ollama: {e}")
             return []
             
-    def generate(self, model: str, prompt: str, system: str = "", options: Dict[str, Any] = None) -> Optional[str]:
+    def generate(
+        self,
+        model: str,
+        prompt: str,
+        system: str = "",
+        options: Dict[str, Any] = None,
+        json_mode: bool = False,
+        stop_when: Optional[Callable[[str], bool]] = None
+    ) -> Optional[str]:
         """
         Generate text using an Ollama model.
         
+        The response is streamed so generation can be cut short: once stop_when
+        returns True for the text received so far, the connection is closed and
+        Ollama stops generating.
+        
         Args:
             model: Name of the model to use
             prompt: User prompt
             system: System instruction
             options: Additional generation options (temperature, top_p, etc.)
+            json_mode: Constrain the output to valid JSON
+            stop_when: Optional check run on the accumulated text after each chunk
+                containing a closing '}' or ']'
             
         Returns:
             Generated text or None if failed
@@ -63,21 +122,45 @@ class OllamaClient:
                 "model": model,
                 "prompt": prompt,
                 "system": system,
-                "stream": False,
+                "stream": True,
                 "options": options or {}
             }
+            if json_mode:
+                payload["format"] = "json"
             
             logger.info(f"Sending generation request to Ollama model: {model}")
-            response = requests.post(url, json=payload, timeout=60)
+            with self.session.post(
+                url,
+                data=_json_dumps(payload),
+                headers={"Content-Type": "application/json"},
+                timeout=60,
+                stream=True
+            ) as response:
+                if response.status_code != 200:
+                    logger.error(f"Ollama generation failed with status {response.status_code}: {response.text}")
+                    return None
+                
+                generated_text = ""
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = _json_loads(line)
+                    if 'error' in chunk:
+                        logger.error(f"Ollama generation failed: {chunk['error']}")
+                        return None
+                    
+                    piece = chunk.get('response', '')
+                    generated_text += piece
+                    if chunk.get('done'):
+                        break
+                    # A response can only become complete on a closing bracket,
+                    # so the whole text is only checked after one arrives
+                    if stop_when and ('}' in piece or ']' in piece) and stop_when(generated_text):
+                        logger.debug("Stopping Ollama generation early, response is complete")
+                        break
             
-            if response.status_code == 200:
-                result = response.json()
-                generated_text = result.get('response', '')
-                logger.debug(f"Ollama generation response: {generated_text[:100]}...")
-                return generated_text
-            else:
-                logger.error(f"Ollama generation failed with status {response.status_code}: {response.text}")
-                return None
+            logger.debug(f"Ollama generation response: {generated_text[:100]}...")
+            return generated_text
                 
         except Exception as e:
             logger.error(f"Ollama generation request failed: {e}")
@@ -91,7 +174,7 @@ class OllamaClient:
             True if service is reachable
         """
         try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=2)
+            response = self.session.get(f"{self.base_url}/api/tags", timeout=2)
             return response.status_code == 200
         except:
             return False
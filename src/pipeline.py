@@ -0,0 +1,166 @@
+"""
+Extraction pipeline for Invoice Data Extractor.
+Overlaps OCR of upcoming files with LLM extraction of already processed ones.
+"""
+import asyncio
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import Config
+from src.logger import setup_logger
+from src.utils import text_fingerprint
+
+logger = setup_logger(__name__)
+
+
+class ExtractionPipeline:
+    """
+    Runs OCR and LLM extraction for several invoices as a two-stage pipeline.
+    
+    OCR is CPU-bound and the LLM call is network-bound, so each batch of OCR
+    results is sent to the LLM in the background while the next files are OCR'd.
+    
+    With a cache, invoices whose OCR text matches a previous extraction (ignoring
+    case and whitespace) skip the LLM entirely.
+    """
+    
+    def __init__(
+        self,
+        ocr_processor,
+        invoice_extractor,
+        batch_size: int = None,
+        cache=None,
+        cache_key: str = None
+    ):
+        """
+        Initialize the pipeline.
+        
+        Args:
+            ocr_processor: OCRProcessor used to extract text from PDF bytes
+            invoice_extractor: InvoiceExtractor used to extract invoice fields
+            batch_size: Invoices per LLM request. Uses Config.LLM_BATCH_SIZE if not provided.
+            cache: Optional store with get_cached_extractions/cache_extractions,
+                such as DatabaseManager
+            cache_key: Model identifier that cached extractions are stored under
+        """
+        self.ocr_processor = ocr_processor
+        self.invoice_extractor = invoice_extractor
+        self.batch_size = max(1, batch_size or Config.LLM_BATCH_SIZE)
+        self.cache = cache if cache_key else None
+        self.cache_key = cache_key
+    
+    def run(
+        self,
+        documents: List[bytes],
+        on_progress: Optional[Callable[[str, float], None]] = None
+    ) -> List[Tuple[Optional[Dict[str, str]], Optional[str]]]:
+        """
+        Extract invoice data from several PDFs.
+        
+        Args:
+            documents: Raw PDF bytes for each invoice
+            on_progress: Optional callback receiving a status message and the
+                fraction of work completed
+        
+        Returns:
+            List of (extracted_data, error) tuples in input order. extracted_data
+            is None when the file could not be processed.
+        """
+        if not documents:
+            return []
+        return asyncio.run(self._run(documents, on_progress or (lambda message, fraction: None)))
+    
+    async def _run(self, documents, on_progress):
+        """Produce OCR text file by file and dispatch LLM batches as they fill up."""
+        total_steps = len(documents) * 2
+        completed = 0
+        extracted = {}
+        errors = {}
+        fingerprints = {}
+        llm_tasks = []
+        batch = []
+        # Bounds how many LLM requests are in flight at once
+        llm_slots = asyncio.Semaphore(max(1, Config.LLM_CONCURRENCY))
+        
+        for idx, pdf_bytes in enumerate(documents):
+            on_progress(f"🔍 Extracting text from file {idx + 1} of {len(documents)}...", completed / total_steps)
+            try:
+                text, fingerprint, cached = await asyncio.to_thread(self._ocr_document, pdf_bytes)
+            except Exception as e:
+                errors[idx] = str(e)
+                logger.error(f"OCR failed for file {idx + 1}: {e}")
+                completed += 2
+                continue
+            
+            completed += 1
+            if cached is not None:
+                logger.info(f"File {idx + 1} matches a previous extraction, skipping the LLM")
+                extracted[idx] = cached
+                completed += 1
+                continue
+            
+            fingerprints[idx] = fingerprint
+            batch.append((idx, text))
+            
+            if len(batch) >= self.batch_size:
+                llm_tasks.append(asyncio.create_task(self._extract_batch(batch, llm_slots)))
+                batch = []
+        
+        if batch:
+            llm_tasks.append(asyncio.create_task(self._extract_batch(batch, llm_slots)))
+        
+        on_progress("🤖 Analyzing invoices with AI...", completed / total_steps)
+        for task in asyncio.as_completed(llm_tasks):
+            batch_results = await task
+            extracted.update(batch_results)
+            completed += len(batch_results)
+            on_progress("🤖 Analyzing invoices with AI...", completed / total_steps)
+        
+        if self.cache is not None:
+            # Failed extractions are not cached so the next attempt calls the LLM again
+            new_extractions = {
+                fingerprints[idx]: data
+                for idx, data in extracted.items()
+                if idx in fingerprints and any(value != "Unknown" for value in data.values())
+            }
+            if new_extractions:
+                await asyncio.to_thread(self._store_extractions, new_extractions)
+        
+        return [(extracted.get(idx), errors.get(idx)) for idx in range(len(documents))]
+    
+    def _ocr_document(self, pdf_bytes: bytes) -> Tuple[str, Optional[str], Optional[Dict[str, str]]]:
+        """
+        OCR one document and look up its text in the extraction cache.
+        
+        Returns:
+            Tuple of (text, text fingerprint, cached extraction or None)
+        """
+        text = self.ocr_processor.extract_text_from_pdf_bytes(pdf_bytes)
+        if self.cache is None:
+            return text, None, None
+        
+        fingerprint = text_fingerprint(text)
+        try:
+            cached = self.cache.get_cached_extractions([fingerprint], self.cache_key).get(fingerprint)
+        except Exception as e:
+            logger.error(f"Extraction cache lookup failed: {e}")
+            cached = None
+        return text, fingerprint, cached
+    
+    def _store_extractions(self, extractions: Dict[str, Dict[str, str]]) -> None:
+        """Save new extractions under their text fingerprints."""
+        try:
+            self.cache.cache_extractions(extractions, self.cache_key)
+        except Exception as e:
+            logger.error(f"Failed to cache extraction results: {e}")
+    
+    async def _extract_batch(
+        self,
+        batch: List[Tuple[int, str]],
+        llm_slots: asyncio.Semaphore
+    ) -> Dict[int, Dict[str, str]]:
+        """Run LLM extraction for one batch in a worker thread once a request slot is free."""
+        indices = [idx for idx, _ in batch]
+        texts = [text for _, text in batch]
+        async with llm_slots:
+            results = await asyncio.to_thread(self.invoice_extractor.extract_invoice_data_batch, texts)
+        return dict(zip(indices, results))
@@ -0,0 +1,153 @@
+"""
+Rule-based invoice field extraction for Invoice Data Extractor.
+Pulls company name, invoice date, and total amount straight from OCR text so
+well-formed invoices don't need an LLM call.
+"""
+import re
+from typing import Dict, Optional
+
+from src.logger import setup_logger
+from src.utils import AmountParser, DateParser
+
+logger = setup_logger(__name__)
+
+# "Total", "Total Amount Due", "Grand Total: $1,234.50", "Balance Due 99.00" -
+# but not "Sub Total" or "Total Tax"
+TOTAL_RE = re.compile(
+    r"(?<!sub)(?<!sub )(?<!sub-)"
+    r"(?P<label>\b(?:grand[ \t]+total|total|(?:amount|balance)[ \t]+due)\b"
+    r"(?:[ \t]+(?:amount|due|payable|invoice))*)[ \t]*[:\-]?[ \t]*"
+    r"(?P<currency>INR|USD|EUR|GBP|Rs\.?|\$|€|£|₹)?[ \t]*"
+    r"(?P<amount>\d{1,3}(?:[,. ]\d{3})+(?:[.,]\d{2})?|\d+(?:[.,]\d{2})?)(?![\d,.]*\d)",
+    re.IGNORECASE
+)
+# Labels that name the amount payable, preferred over a plain "Total"
+_AMOUNT_DUE_LABEL_RE = re.compile(r"grand|due", re.IGNORECASE)
+# Amounts without a currency marker must have cents, so quantities and line
+# counts labelled "Total" are not mistaken for the invoice total
+_DECIMAL_PART_RE = re.compile(r"[.,]\d{2}$")
+
+_DATE_TOKEN = (
+    r"\d{4}-\d{2}-\d{2}"
+    r"|\d{1,2}[-/.]\d{1,2}[-/.]\d{4}"
+    r"|\d{1,2}[- ][A-Za-z]{3,9}[- ]\d{2,4}"
+    r"|[A-Za-z]{3,9} \d{1,2}, \d{4}"
+)
+INVOICE_DATE_RE = re.compile(
+    rf"\binvoice[ \t]+date\b[^\n\d]{{0,20}}?({_DATE_TOKEN})\b",
+    re.IGNORECASE
+)
+DATE_RE = re.compile(
+    rf"(?<!due )(?<!due)\bdate\b[^\n\d]{{0,20}}?({_DATE_TOKEN})\b",
+    re.IGNORECASE
+)
+
+COMPANY_LABEL_RE = re.compile(
+    r"^[ \t]*(?:company(?:[ \t]+name)?|from|seller|vendor|supplier|billed[ \t]+by)[ \t]*[:\-][ \t]*(.+?)[ \t]*$",
+    re.IGNORECASE | re.MULTILINE
+)
+# Label values that are a date or contact details rather than a name
+_NOT_COMPANY_RE = re.compile(rf"^(?:{_DATE_TOKEN})$|@|www\.|https?:", re.IGNORECASE)
+
+
+def _looks_like_company(value: str) -> bool:
+    """Check that a labelled value is mostly letters and not a date or contact detail."""
+    letters = sum(char.isalpha() for char in value)
+    return (
+        letters >= 2
+        and letters * 2 > len(value)
+        and not _NOT_COMPANY_RE.search(value)
+    )
+
+
+def extract_company_name(text: str) -> Optional[str]:
+    """
+    Find the issuing company from a "From:", "Company:" or "Vendor:" style label.
+    
+    Unlabelled letterheads are not guessed at: the first lines of an invoice
+    are as often a banner ("ORIGINAL FOR RECIPIENT") or the customer's name as
+    the seller's, so those invoices are left for the LLM.
+    
+    Args:
+        text: OCR text of the invoice
+    
+    Returns:
+        Company name, or None if no labelled value looks like one
+    """
+    for match in COMPANY_LABEL_RE.finditer(text):
+        value = match.group(1)
+        if _looks_like_company(value):
+            return value
+    return None
+
+
+def extract_invoice_date(text: str) -> Optional[str]:
+    """
+    Find the invoice date, preferring an explicit "Invoice Date" label over
+    other dates (due dates are skipped).
+    
+    Args:
+        text: OCR text of the invoice
+    
+    Returns:
+        Date as written on the invoice, or None if no parseable date was found
+    """
+    for pattern in (INVOICE_DATE_RE, DATE_RE):
+        for match in pattern.finditer(text):
+            date_str = match.group(1)
+            if DateParser.parse_date(date_str):
+                return date_str
+    return None
+
+
+def extract_total_amount(text: str) -> Optional[str]:
+    """
+    Find the invoice total. Only amounts with a currency marker or a decimal
+    part count; "Amount Due", "Balance Due" and "Grand Total" lines win over a
+    plain "Total", and among equals the last one wins.
+    
+    Args:
+        text: OCR text of the invoice
+    
+    Returns:
+        Amount as a plain number string, or None if no total was found
+    """
+    matches = [
+        match for match in TOTAL_RE.finditer(text)
+        if match.group('currency') or _DECIMAL_PART_RE.search(match.group('amount'))
+    ]
+    if not matches:
+        return None
+    
+    due = [match for match in matches if _AMOUNT_DUE_LABEL_RE.search(match.group('label'))]
+    best = (due or matches)[-1]
+    amount = AmountParser.parse_amount(best.group('amount').replace(" ", ""))
+    if amount is None or amount <= 0:
+        return None
+    return f"{amount:.2f}"
+
+
+def extract_invoice_fields(text: str) -> Optional[Dict[str, str]]:
+    """
+    Extract all invoice fields with rules, if every one of them can be found.
+    
+    Args:
+        text: OCR text of the invoice
+    
+    Returns:
+        Dictionary with company_name, invoice_date, and total_amount, or None
+        if any field is missing and the invoice should go to the LLM
+    """
+    fields = {
+        'company_name': extract_company_name(text),
+        'invoice_date': extract_invoice_date(text),
+        'total_amount': extract_total_amount(text)
+    }
+    
+    missing = [field for field, value in fields.items() if not value]
+    if missing:
+        logger.debug(f"Rule-based extraction missed {', '.join(missing)}")
+        return None
+    
+    logger.info("Extracted invoice fields with rules, skipping the LLM")
+    return fields
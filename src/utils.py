@@ -1,15 +1,155 @@
 """
 Utility functions for Invoice Data Extractor.
 Handles date parsing, validation, and data formatting.
+
+These helpers work on short strings one at a time, so their cost is Python
+interpreter overhead rather than memory bandwidth. Speed them up with
+precompiled regexes, fromisoformat/slice-based parsers, lru_cache on pure
+functions, and fingerprint dispatch instead of strptime retry loops; SIMD,
+GPU, or Numba acceleration does not apply here.
 """
-from datetime import datetime
+from datetime import date, datetime
+import calendar
 from typing import Optional, Union
+import functools
+import hashlib
 import re
 
 from src.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+# Parsed dates and amounts are memoized; invoices from the same vendor repeat
+# the same strings and the parsers are pure
+_PARSE_CACHE_SIZE = 4096
+
+
+def _date_fingerprint(date_str: str) -> tuple:
+    """
+    Summarize the shape of a date string: its first separator, whether it
+    contains letters, and whether it starts with one.
+    
+    Any whitespace counts as a space, as strptime matches a space in a format
+    against any run of whitespace.
+    """
+    separator = next(
+        (' ' if char.isspace() else char for char in date_str if not char.isalnum()),
+        None
+    )
+    has_alpha = any(char.isalpha() for char in date_str)
+    return (separator, has_alpha, date_str[:1].isalpha())
+
+
+def _index_formats(formats: list) -> dict:
+    """Group date formats by the fingerprint of the dates they produce, keeping their order."""
+    sample = datetime(2024, 6, 17)
+    index = {}
+    for fmt in formats:
+        index.setdefault(_date_fingerprint(sample.strftime(fmt)), []).append(fmt)
+    return index
+
+
+# Returned by the fast date parsers when a string doesn't have the plain
+# layout they handle, so strptime has to decide
+_NOT_HANDLED = object()
+
+
+def _numeric_date_parser(separator: str, order: str):
+    """
+    Build a parser for an all-numeric format such as %d-%m-%Y, given its
+    separator and field order ('dmy', 'ymd' or 'mdy').
+    
+    Day and month are 1-2 digits and the year 4, as strptime accepts. Strings
+    this can't decide (non-ASCII digits, a space-padded day, years before 1000)
+    are left to strptime.
+    """
+    def parse(date_str: str):
+        if not date_str.isascii():
+            return _NOT_HANDLED
+        parts = date_str.split(separator)
+        if len(parts) != 3:
+            return None
+        fields = dict(zip(order, parts))
+        day, month, year = fields['d'], fields['m'], fields['y']
+        if not (day.isdigit() and month.isdigit() and year.isdigit()) or year.startswith('0'):
+            return _NOT_HANDLED
+        if not (len(day) <= 2 and len(month) <= 2 and len(year) == 4):
+            return None
+        try:
+            return date(int(year), int(month), int(day)).isoformat()
+        except ValueError:
+            return None
+    return parse
+
+
+# Month names as strptime's %B and %b match them (case-insensitively)
+_MONTH_NAMES = {name.lower(): number for number, name in enumerate(calendar.month_name) if name}
+_MONTH_ABBREVIATIONS = {name.lower(): number for number, name in enumerate(calendar.month_abbr) if name}
+
+
+def _month_name_date_parser(separator: Optional[str], order: str, months: dict,
+                            year_digits: int, day_suffix: str = ''):
+    """
+    Build a parser for a format with a month name, such as %d-%b-%y or %B %d, %Y.
+    
+    Args:
+        separator: Field separator, or None for whitespace runs
+        order: Field order, e.g. 'dmy'
+        months: _MONTH_NAMES for %B or _MONTH_ABBREVIATIONS for %b
+        year_digits: 2 for %y, 4 for %Y
+        day_suffix: Text directly following the day, e.g. ',' in "June 17, 2024"
+    """
+    def parse(date_str: str):
+        if not date_str.isascii():
+            return _NOT_HANDLED
+        parts = date_str.split(separator)
+        if len(parts) != 3:
+            return None
+        fields = dict(zip(order, parts))
+        day, month_name, year = fields['d'], fields['m'], fields['y']
+        if day_suffix:
+            if not day.endswith(day_suffix):
+                return None
+            day = day[:-len(day_suffix)]
+        
+        month = months.get(month_name.lower())
+        if (
+            month is None
+            or not (day.isdigit() and len(day) <= 2)
+            or not (year.isdigit() and len(year) == year_digits)
+        ):
+            return None
+        
+        year = int(year)
+        if year_digits == 2:
+            # strptime's %y pivot: 69-99 are 1900s, 00-68 are 2000s
+            year += 2000 if year < 69 else 1900
+        elif year < 1000:
+            return _NOT_HANDLED
+        try:
+            return date(year, month, int(day)).isoformat()
+        except ValueError:
+            return None
+    return parse
+
+
+def _parse_iso_date(date_str: str) -> date:
+    """
+    Parse a YYYY-MM-DD date as strptime(date_str, '%Y-%m-%d') would.
+    
+    Zero-padded ASCII dates, i.e. everything the app stores, take the C
+    date.fromisoformat parser; anything else is left to strptime.
+    
+    Raises:
+        ValueError: If the string is not a valid date
+    """
+    if (
+        len(date_str) == 10 and date_str.isascii() and date_str[4] == date_str[7] == '-'
+        and date_str[:4].isdigit() and date_str[5:7].isdigit() and date_str[8:].isdigit()
+    ):
+        return date.fromisoformat(date_str)
+    return datetime.strptime(date_str, '%Y-%m-%d').date()
+
 
 class DateParser:
     """Handles various date format parsing and conversion."""
@@ -28,8 +168,25 @@ class DateParser:
         '%d %B %Y',      # 17 June 2024
         '%d %b %Y',      # 17 Jun 2024
     ]
+    # Only formats whose output has the same shape as the input can match it
+    _FORMATS_BY_FINGERPRINT = _index_formats(FORMATS)
+    # Splitting, int() and month-name lookups instead of strptime
+    _FAST_PARSERS = {
+        '%d-%b-%y': _month_name_date_parser('-', 'dmy', _MONTH_ABBREVIATIONS, 2),
+        '%d-%b-%Y': _month_name_date_parser('-', 'dmy', _MONTH_ABBREVIATIONS, 4),
+        '%d-%m-%Y': _numeric_date_parser('-', 'dmy'),
+        '%d.%m.%Y': _numeric_date_parser('.', 'dmy'),
+        '%d/%m/%Y': _numeric_date_parser('/', 'dmy'),
+        '%Y-%m-%d': _numeric_date_parser('-', 'ymd'),
+        '%m/%d/%Y': _numeric_date_parser('/', 'mdy'),
+        '%B %d, %Y': _month_name_date_parser(None, 'mdy', _MONTH_NAMES, 4, day_suffix=','),
+        '%b %d, %Y': _month_name_date_parser(None, 'mdy', _MONTH_ABBREVIATIONS, 4, day_suffix=','),
+        '%d %B %Y': _month_name_date_parser(None, 'dmy', _MONTH_NAMES, 4),
+        '%d %b %Y': _month_name_date_parser(None, 'dmy', _MONTH_ABBREVIATIONS, 4),
+    }
     
     @classmethod
+    @functools.lru_cache(maxsize=_PARSE_CACHE_SIZE)
     def parse_date(cls, date_str: str) -> Optional[str]:
         """
         Parse date string to YYYY-MM-DD format.
@@ -46,12 +203,21 @@ class DateParser:
         # Clean the date string
         date_str = date_str.strip()
         
-        # Try all supported formats
-        for fmt in cls.FORMATS:
+        # Try the supported formats that fit the string's shape
+        for fmt in cls._FORMATS_BY_FINGERPRINT.get(_date_fingerprint(date_str), ()):
+            fast_parser = cls._FAST_PARSERS.get(fmt)
+            if fast_parser is not None:
+                result = fast_parser(date_str)
+                if result is None:
+                    continue
+                if result is not _NOT_HANDLED:
+                    logger.debug("Parsed date '%s' as '%s' using format '%s'", date_str, result, fmt)
+                    return result
+            
             try:
                 parsed_date = datetime.strptime(date_str, fmt)
                 result = parsed_date.strftime('%Y-%m-%d')
-                logger.debug(f"Parsed date '{date_str}' as '{result}' using format '{fmt}'")
+                logger.debug("Parsed date '%s' as '%s' using format '%s'", date_str, result, fmt)
                 return result
             except ValueError:
                 continue
@@ -72,10 +238,14 @@ class DateParser:
             Formatted date string
         """
         try:
-            date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-            return date_obj.strftime(format_str)
+            date_obj = _parse_iso_date(date_str)
         except ValueError:
             return date_str
+        
+        if format_str == '%d-%m-%Y':
+            # The default display format, without a strftime call
+            return f"{date_obj.day:02d}-{date_obj.month:02d}-{date_obj.year}"
+        return date_obj.strftime(format_str)
     
     @classmethod
     def validate_date_range(cls, from_date: str, to_date: str) -> bool:
@@ -90,17 +260,28 @@ class DateParser:
             True if date range is valid
         """
         try:
-            from_dt = datetime.strptime(from_date, '%Y-%m-%d')
-            to_dt = datetime.strptime(to_date, '%Y-%m-%d')
-            return from_dt <= to_dt
+            return _parse_iso_date(from_date) <= _parse_iso_date(to_date)
         except ValueError:
             return False
 
 
+_AMOUNT_GROUP_SPACE_RE = re.compile(r'(?<=\d)[ \u00a0\u202f](?=\d{3}\b)')
+# A number, with a minus sign that may come before the currency ("-$500", "- ₹ 1,200.00")
+_AMOUNT_NUMBER_RE = re.compile(
+    r'(?:(-)[\s$€£₹¥]*(?:(?:INR|USD|EUR|GBP|Rs)\.?[\s$€£₹¥]*)?)?(\d[\d.,]*)',
+    re.IGNORECASE
+)
+# Plain numbers like "1500" or "1500.50" that float() reads as-is. Three
+# decimals are excluded: "1.500" is a thousands separator.
+_PLAIN_AMOUNT_RE = re.compile(r'-?\d+(?:\.\d{1,2})?', re.ASCII)
+_THOUSANDS_ONLY_RE = re.compile(r'^-?[1-9]\d{0,2}([.,])\d{3}(?:\1\d{3})*$')
+
+
 class AmountParser:
     """Handles amount parsing and validation."""
     
     @staticmethod
+    @functools.lru_cache(maxsize=_PARSE_CACHE_SIZE)
     def parse_amount(amount_str: str) -> Optional[float]:
         """
         Parse amount string to float.
@@ -114,34 +295,36 @@ class AmountParser:
         if not amount_str or amount_str == "Unknown":
             return None
         
+        if _PLAIN_AMOUNT_RE.fullmatch(amount_str):
+            return float(amount_str)
+        
+        # Join digit groups separated by spaces ("1 234,56"), then take the
+        # first number, ignoring currency symbols and surrounding text
+        joined = _AMOUNT_GROUP_SPACE_RE.sub('', amount_str)
+        match = _AMOUNT_NUMBER_RE.search(joined)
+        if not match:
+            logger.warning(f"Failed to parse amount '{amount_str}': no number found")
+            return None
+        number = (match.group(1) or '') + match.group(2).rstrip('.,')
+        
+        if _THOUSANDS_ONLY_RE.match(number):
+            # "1,234" or "1.234.567": the separators group thousands
+            cleaned = number.replace(',', '').replace('.', '')
+        elif number.rfind('.') > number.rfind(','):
+            # "1,234.56": the dot is the decimal separator
+            cleaned = number.replace(',', '')
+        else:
+            # "1.234,56" or "12,5": the comma is the decimal separator
+            cleaned = number.replace('.', '').replace(',', '.')
+        
         try:
-            # Remove currency symbols and whitespace
-            cleaned = re.sub(r'[^\d.,\-]', '', amount_str)
-            
-            # Handle different decimal separators
-            # If there are multiple dots/commas, assume the last one is decimal
-            if cleaned.count('.') > 1:
-                cleaned = cleaned.replace('.', '', cleaned.count('.') - 1)
-            if cleaned.count(',') > 1:
-                cleaned = cleaned.replace(',', '', cleaned.count(',') - 1)
-            
-            # Replace comma with dot for decimal
-            if ',' in cleaned and '.' not in cleaned:
-                cleaned = cleaned.replace(',', '.')
-            elif ',' in cleaned and '.' in cleaned:
-                # Determine which is decimal separator (last one wins)
-                if cleaned.rindex(',') > cleaned.rindex('.'):
-                    cleaned = cleaned.replace('.', '').replace(',', '.')
-                else:
-                    cleaned = cleaned.replace(',', '')
-            
             amount = float(cleaned)
-            logger.debug(f"Parsed amount '{amount_str}' as {amount}")
-            return amount
-            
-        except (ValueError, AttributeError) as e:
+        except ValueError as e:
             logger.warning(f"Failed to parse amount '{amount_str}': {e}")
             return None
+        
+        logger.debug("Parsed amount '%s' as %s", amount_str, amount)
+        return amount
     
     @staticmethod
     def format_amount(amount: float, currency: str = '$') -> str:
@@ -172,7 +355,8 @@ class Validator:
         Returns:
             True if valid
         """
-        return bool(company_name and company_name.strip() and company_name != "Unknown")
+        # isspace() checks for an all-whitespace name without building a stripped copy
+        return bool(company_name) and not company_name.isspace() and company_name != "Unknown"
     
     @staticmethod
     def validate_invoice_data(data: dict) -> tuple[bool, list]:
@@ -199,6 +383,9 @@ class Validator:
         return (len(errors) == 0, errors)
 
 
+_INVALID_FILENAME_CHARS_RE = re.compile(r'[<>:"/\\|?*]')
+
+
 def sanitize_filename(filename: str) -> str:
     """
     Sanitize filename by removing invalid characters.
@@ -210,5 +397,34 @@ def sanitize_filename(filename: str) -> str:
         Sanitized filename
     """
     # Remove invalid filename characters
-    sanitized = re.sub(r'[<>:"/\\|?*]', '_', filename)
+    sanitized = _INVALID_FILENAME_CHARS_RE.sub('_', filename)
     return sanitized
+
+
+def content_hash(data: bytes) -> str:
+    """
+    Compute a short hash identifying file contents.
+    
+    Args:
+        data: Raw file bytes
+        
+    Returns:
+        Hex digest of the contents
+    """
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def text_fingerprint(text: str) -> str:
+    """
+    Compute a hash of extracted text that ignores case and whitespace layout.
+    
+    Re-scans or re-exports of the same invoice produce different PDF bytes but
+    usually the same text, differing at most in line breaks and spacing.
+    
+    Args:
+        text: Text extracted from a document
+        
+    Returns:
+        Hex digest of the normalized text
+    """
+    return content_hash(" ".join(text.split()).casefold().encode('utf-8'))
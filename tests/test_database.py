@@ -6,6 +6,13 @@ from pathlib import Path
 
 from src.database import DatabaseManager
 
+# Three invoices from two companies, shared by the search and statistics tests
+SAMPLE_INVOICES = [
+    ("Company A", "2024-01-10", 1000.00),
+    ("Company B", "2024-01-15", 2000.00),
+    ("Company A", "2024-01-20", 1500.00),
+]
+
 
 @pytest.fixture
 def temp_db():
@@ -17,6 +24,7 @@ def temp_db():
     yield db
     
     # Cleanup
+    db.close()
     Path(path).unlink(missing_ok=True)
 
 
@@ -28,6 +36,27 @@ def test_database_initialization(temp_db):
         assert cursor.fetchone() is not None
 
 
+def test_date_search_uses_index(temp_db):
+    """Test date range searches use the composite date/company index."""
+    with temp_db.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM invoices WHERE invoice_date >= ? AND invoice_date <= ?",
+            ("2024-01-01", "2024-01-31")
+        )
+        plan = " ".join(str(row[-1]) for row in cursor.fetchall())
+    
+    assert "idx_invoices_date_company" in plan
+
+
+def test_close_reopens_connection(temp_db):
+    """Test the shared connection is reopened after close."""
+    temp_db.insert_invoice("Company A", "2024-01-10", 1000.00)
+    temp_db.close()
+    
+    assert len(temp_db.get_all_invoices()) == 1
+
+
 def test_insert_invoice(temp_db):
     """Test inserting an invoice."""
     invoice_id = temp_db.insert_invoice(
@@ -39,12 +68,24 @@ def test_insert_invoice(temp_db):
     assert invoice_id > 0
 
 
+def test_insert_invoices(temp_db):
+    """Test inserting several invoices at once."""
+    temp_db.insert_invoice("Company Z", "2024-01-01", 10.00)
+    invoice_ids = temp_db.insert_invoices([
+        ("Company A", "2024-01-10", 1000.00),
+        ("Company B", "2024-01-15", 2000.00),
+    ], synchronous_off=True)
+    
+    rows = {row[0]: row[1] for row in temp_db.get_all_invoices()}
+    assert [rows[invoice_id] for invoice_id in invoice_ids] == ["Company A", "Company B"]
+    with temp_db.get_connection() as conn:
+        assert conn.execute('PRAGMA synchronous').fetchone()[0] == 1  # NORMAL
+
+
 def test_search_invoices(temp_db):
     """Test searching invoices."""
     # Insert test data
-    temp_db.insert_invoice("Company A", "2024-01-10", 1000.00)
-    temp_db.insert_invoice("Company B", "2024-01-15", 2000.00)
-    temp_db.insert_invoice("Company A", "2024-01-20", 1500.00)
+    temp_db.insert_invoices(SAMPLE_INVOICES)
     
     # Search by date range
     results = temp_db.search_invoices(from_date="2024-01-12", to_date="2024-01-18")
@@ -55,11 +96,74 @@ def test_search_invoices(temp_db):
     assert len(results) == 2
 
 
+def test_company_search_uses_full_text_index(temp_db):
+    """Test partial company name matches are served by the FTS index and kept in sync."""
+    temp_db.insert_invoice("Acme Corporation", "2024-01-10", 1000.00)
+    invoice_id = temp_db.insert_invoice("Globex Ltd", "2024-01-15", 2000.00)
+    
+    assert len(temp_db.search_invoices(company_name="corp")) == 1
+    assert len(temp_db.search_invoices(company_name="bex")) == 1
+    
+    temp_db.delete_invoice(invoice_id)
+    assert temp_db.search_invoices(company_name="Globex") == []
+    
+    with temp_db.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "EXPLAIN QUERY PLAN SELECT rowid FROM invoices_fts WHERE company_name LIKE ?",
+            ("%corp%",)
+        )
+        plan = " ".join(str(row[-1]) for row in cursor.fetchall())
+    assert "VIRTUAL TABLE INDEX" in plan
+
+
+def test_company_search_indexes_existing_invoices():
+    """Test invoices saved before the FTS table existed become searchable."""
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        db = DatabaseManager(db_path=path)
+        db.insert_invoice("Acme Corporation", "2024-01-10", 1000.00)
+        with db.get_connection() as conn:
+            conn.execute("DROP TABLE invoices_fts")
+        db.close()
+        
+        db = DatabaseManager(db_path=path)
+        assert len(db.search_invoices(company_name="Acme")) == 1
+        db.close()
+    finally:
+        Path(path).unlink(missing_ok=True)
+
+
+def test_search_invoices_paging(temp_db):
+    """Test counting matches and paging through search results."""
+    temp_db.insert_invoices(SAMPLE_INVOICES)
+    
+    assert temp_db.count_invoices() == 3
+    assert temp_db.count_invoices(company_name="Company A") == 2
+    
+    first_page = temp_db.search_invoices(limit=2)
+    second_page = temp_db.search_invoices(limit=2, offset=2)
+    assert [row[2] for row in first_page] == ["2024-01-20", "2024-01-15"]
+    assert [row[2] for row in second_page] == ["2024-01-10"]
+
+
+def test_iter_invoices_in_chunks(temp_db):
+    """Test iterating all invoices chunk by chunk matches the full listing."""
+    temp_db.insert_invoices([
+        ("Company A", "2024-01-10", 1000.00),
+        ("Company B", "2024-01-15", 2000.00),
+        ("Company C", "2024-01-15", 1500.00),
+        ("Company D", "2024-01-20", 500.00),
+    ])
+    
+    assert list(temp_db.iter_invoices(chunk_size=2)) == temp_db.search_invoices()
+    assert temp_db.get_invoices_page(offset=1, limit=2) == temp_db.search_invoices()[1:3]
+
+
 def test_get_statistics(temp_db):
     """Test getting database statistics."""
-    temp_db.insert_invoice("Company A", "2024-01-10", 1000.00)
-    temp_db.insert_invoice("Company B", "2024-01-15", 2000.00)
-    temp_db.insert_invoice("Company A", "2024-01-20", 1500.00)
+    temp_db.insert_invoices(SAMPLE_INVOICES)
     
     stats = temp_db.get_statistics()
     
@@ -79,3 +183,12 @@ def test_delete_invoice(temp_db):
     # Verify it's deleted
     all_invoices = temp_db.get_all_invoices()
     assert len(all_invoices) == 0
+
+
+def test_extraction_cache(temp_db):
+    """Test caching extracted invoice data by content hash."""
+    data = {'company_name': 'Test Company', 'invoice_date': '15-01-2024', 'total_amount': '1000.00'}
+    temp_db.cache_extractions({'abc123': data}, model='google:gemini')
+    
+    assert temp_db.get_cached_extractions(['abc123', 'missing'], 'google:gemini') == {'abc123': data}
+    assert temp_db.get_cached_extractions(['abc123'], 'openai:gpt-4') == {}
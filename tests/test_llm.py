@@ -0,0 +1,87 @@
+"""Tests for LLM extraction helpers."""
+from collections import OrderedDict
+
+import pytest
+
+from config import Config
+from src import llm as llm_module
+from src.llm import InvoiceExtractor
+
+
+@pytest.fixture
+def extractor():
+    """Create an extractor whose client makes no network calls on setup."""
+    return InvoiceExtractor(provider='ollama', model_name='test-model')
+
+
+def test_pack_batches_respects_size_and_context(extractor, monkeypatch):
+    """Test invoices are packed by count and by the context token budget."""
+    monkeypatch.setattr(Config, 'LLM_BATCH_SIZE', 2)
+    monkeypatch.setattr(Config, 'LLM_MAX_OUTPUT_TOKENS', 100)
+    monkeypatch.setattr(Config, 'LLM_CONTEXT_TOKENS', 1000)
+    texts = ["a" * 400, "b" * 400, "c" * 400, "d" * 4000, "e" * 400]
+    
+    assert extractor._pack_batches(list(range(5)), texts) == [[0, 1], [2], [3], [4]]
+
+
+def test_parse_llm_output_json_and_labelled(extractor):
+    """Test JSON and labelled responses are parsed into the same fields."""
+    expected = {'company_name': 'Acme Corp', 'invoice_date': '01-02-2024', 'total_amount': '1234.50'}
+    
+    json_output = '```json\n{"company_name": "Acme Corp", "invoice_date": "01-02-2024", "total_amount": 1234.5}\n```'
+    labelled_output = "Company name: Acme Corp Invoice date: 01-02-2024 Total amount: $1,234.50"
+    
+    assert extractor._parse_llm_output(json_output) == expected
+    assert extractor._parse_llm_output(labelled_output) == expected
+
+
+def test_repeated_text_reuses_cached_extraction(extractor, monkeypatch):
+    """Test identical invoice text is only sent to the LLM once."""
+    monkeypatch.setattr(Config, 'RULE_BASED_EXTRACTION', False)
+    monkeypatch.setattr(llm_module, '_response_cache', OrderedDict())
+    calls = []
+    
+    def fake_extract(invoice_text):
+        calls.append(invoice_text)
+        return {'company_name': 'Acme Corp', 'invoice_date': '01-02-2024', 'total_amount': '10.00'}
+    
+    monkeypatch.setattr(extractor, '_extract_with_llm', fake_extract)
+    
+    first = extractor.extract_invoice_data("Acme invoice")
+    second = extractor.extract_invoice_data("Acme invoice")
+    
+    assert first == second
+    assert calls == ["Acme invoice"]
+    assert extractor.extract_invoice_data_batch(["Acme invoice"]) == [first]
+    assert len(calls) == 1
+
+
+def test_has_complete_json_waits_for_closing_bracket():
+    """Test streamed output is only complete once the JSON value is closed."""
+    assert not llm_module._has_complete_json('{"company_name": "Acme", ')
+    assert not llm_module._has_complete_json('[{"invoice": 1}, {"invoice": 2}')
+    assert llm_module._has_complete_json('```json\n{"company_name": "Acme"}')
+    assert llm_module._has_complete_json('[{"invoice": 1}, {"invoice": 2}]')
+
+
+def test_parse_batch_output_unwraps_invoices_object(extractor):
+    """Test JSON-mode batch responses are matched to invoices by number."""
+    output = (
+        '{"invoices": [{"invoice": 2, "company_name": "Beta Ltd", "invoice_date": null, "total_amount": 5},'
+        ' {"invoice": 1, "company_name": "Acme Corp", "invoice_date": "01-02-2024", "total_amount": "10.00"}]}'
+    )
+    
+    results = extractor._parse_batch_output(output)
+    
+    assert results[1]['company_name'] == 'Acme Corp'
+    assert results[2] == {'company_name': 'Beta Ltd', 'invoice_date': 'Unknown', 'total_amount': '5.00'}
+
+
+def test_google_model_is_rebuilt_for_new_api_key():
+    """Test a corrected Gemini API key gets its own model instead of the cached one."""
+    first = InvoiceExtractor(provider='google', model_name='gemini-test', api_key='key-a')
+    same = InvoiceExtractor(provider='google', model_name='gemini-test', api_key='key-a')
+    corrected = InvoiceExtractor(provider='google', model_name='gemini-test', api_key='key-b')
+    
+    assert first.client is same.client
+    assert first.client is not corrected.client
@@ -0,0 +1,49 @@
+"""Tests for OCR helpers."""
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from src import ocr
+from src.ocr import _is_readable_text
+
+
+def test_is_readable_text_rejects_broken_text_layers():
+    """Test text layers made of unmapped glyphs are sent to OCR."""
+    assert _is_readable_text("ACME Corp\nInvoice Date: 01-02-2024\nTotal: ₹1,234.50")
+    assert not _is_readable_text("(cid:12)(cid:34)(cid:56) (cid:78)(cid:90) Total")
+    assert not _is_readable_text("�� ab")
+    assert not _is_readable_text("   \n ")
+
+
+def test_blank_pages_skip_the_fallback_pass(monkeypatch):
+    """Test only pages with low-confidence text are OCR'd again at a higher DPI."""
+    monkeypatch.setattr(ocr.Config, 'OCR_MIN_CONFIDENCE', 60)
+    monkeypatch.setattr(ocr.Config, 'OCR_DPI', 150)
+    monkeypatch.setattr(ocr.Config, 'OCR_FALLBACK_DPI', 200)
+    
+    assert ocr._needs_fallback_pass("T0tal: 1,2B0.00", 35)
+    assert not ocr._needs_fallback_pass("", 0)
+    assert not ocr._needs_fallback_pass(" \n\f", 0)
+    assert not ocr._needs_fallback_pass("Total: 1,280.00", 91)
+    assert not ocr._needs_fallback_pass("Total: 1,280.00", None)
+
+
+def _synthetic_page(rotation: float) -> np.ndarray:
+    """Draw a binarized page of text-like lines with a total line sticking out past the table."""
+    image = Image.new('L', (1200, 1600), 255)
+    draw = ImageDraw.Draw(image)
+    for row in range(15):
+        draw.rectangle((100, 300 + 40 * row, 800, 316 + 40 * row), fill=0)
+    draw.rectangle((600, 960, 1100, 976), fill=0)
+    if rotation:
+        image = image.rotate(rotation, fillcolor=255)
+    return np.asarray(image.point(lambda level: 0 if level < 128 else 255))
+
+
+def test_estimate_skew_follows_text_lines():
+    """Test upright pages are left alone and skewed pages are rotated back."""
+    if ocr.cv2 is None:
+        pytest.skip("OpenCV not installed")
+    
+    assert ocr._estimate_skew(_synthetic_page(0)) == 0.0
+    assert ocr._estimate_skew(_synthetic_page(3)) == -3.0
@@ -0,0 +1,72 @@
+"""Tests for the extraction pipeline."""
+from src.pipeline import ExtractionPipeline
+
+
+class FakeOCR:
+    """OCR stand-in that decodes bytes and fails on demand."""
+    
+    def extract_text_from_pdf_bytes(self, pdf_bytes):
+        if pdf_bytes == b"broken":
+            raise ValueError("cannot render PDF")
+        return pdf_bytes.decode()
+
+
+class FakeExtractor:
+    """Extractor stand-in that records the batches it receives."""
+    
+    def __init__(self):
+        self.batches = []
+    
+    def extract_invoice_data_batch(self, texts):
+        self.batches.append(texts)
+        return [{'company_name': text, 'invoice_date': 'Unknown', 'total_amount': 'Unknown'} for text in texts]
+
+
+class FakeCache:
+    """In-memory stand-in for the database extraction cache."""
+    
+    def __init__(self):
+        self.entries = {}
+    
+    def get_cached_extractions(self, content_hashes, model):
+        return {h: self.entries[(h, model)] for h in content_hashes if (h, model) in self.entries}
+    
+    def cache_extractions(self, extractions, model):
+        for content_hash, data in extractions.items():
+            self.entries[(content_hash, model)] = data
+
+
+def test_pipeline_preserves_order_and_batches():
+    """Test results come back in input order, grouped into LLM batches."""
+    extractor = FakeExtractor()
+    pipeline = ExtractionPipeline(FakeOCR(), extractor, batch_size=2)
+    
+    results = pipeline.run([b"a", b"b", b"c"])
+    
+    assert [data['company_name'] for data, _ in results] == ["a", "b", "c"]
+    assert extractor.batches == [["a", "b"], ["c"]]
+
+
+def test_pipeline_reports_ocr_errors():
+    """Test a failing file is reported without blocking the others."""
+    pipeline = ExtractionPipeline(FakeOCR(), FakeExtractor(), batch_size=5)
+    
+    results = pipeline.run([b"a", b"broken"])
+    
+    assert results[0][0]['company_name'] == "a"
+    assert results[1] == (None, "cannot render PDF")
+
+
+def test_pipeline_reuses_extractions_for_matching_text():
+    """Test text differing only in case and spacing is served from the cache."""
+    cache = FakeCache()
+    extractor = FakeExtractor()
+    
+    ExtractionPipeline(FakeOCR(), extractor, cache=cache, cache_key="test:model").run([b"Acme  Corp"])
+    results = ExtractionPipeline(FakeOCR(), extractor, cache=cache, cache_key="test:model").run(
+        [b"acme\ncorp", b"Other Co"]
+    )
+    
+    assert extractor.batches == [["Acme  Corp"], ["Other Co"]]
+    assert results[0][0]['company_name'] == "Acme  Corp"
+    assert results[1][0]['company_name'] == "Other Co"
@@ -0,0 +1,60 @@
+"""Tests for rule-based invoice field extraction."""
+from src.regex_extractor import extract_company_name, extract_invoice_fields, extract_total_amount
+
+
+def test_extracts_well_formed_invoice():
+    """Test all fields are read from a typical invoice layout."""
+    text = """Seller: ACME Widgets Ltd
+12 High Street, Springfield
+TAX INVOICE
+Invoice Date: 17-06-2024
+Due Date: 17-07-2024
+Subtotal: 1,000.00
+Total Tax: 180.00
+Total Amount Due: $1,180.00
+"""
+
+    assert extract_invoice_fields(text) == {
+        'company_name': 'ACME Widgets Ltd',
+        'invoice_date': '17-06-2024',
+        'total_amount': '1180.00'
+    }
+
+
+def test_labelled_company_and_european_amount():
+    """Test labelled company names and comma decimal separators."""
+    text = """INVOICE
+From: Globex Corporation
+Date: June 17, 2024
+Sub Total 90.00
+TOTAL € 1.234,56
+"""
+
+    fields = extract_invoice_fields(text)
+    assert fields['company_name'] == 'Globex Corporation'
+    assert fields['invoice_date'] == 'June 17, 2024'
+    assert fields['total_amount'] == '1234.56'
+
+
+def test_missing_field_falls_back():
+    """Test invoices with any field missing are left for the LLM."""
+    assert extract_invoice_fields("From: ACME Widgets Ltd\nTotal: 100.00") is None
+
+
+def test_company_requires_a_name_like_label():
+    """Test dates, banners and bill-to names are not taken as the company."""
+    assert extract_company_name("From: 01-06-2024") is None
+    assert extract_company_name("ORIGINAL FOR RECIPIENT\nACME Widgets Ltd") is None
+    assert extract_company_name("BILL TO\nJohn Smith\nVendor: ACME Widgets Ltd") == 'ACME Widgets Ltd'
+
+
+def test_total_ignores_subtotal_and_tax():
+    """Test subtotal and tax lines are not mistaken for the total."""
+    assert extract_total_amount("Subtotal: 50.00\nSub-total 50.00\nTotal Tax: 5.00") is None
+
+
+def test_total_prefers_amount_due_and_skips_bare_counts():
+    """Test a quantity labelled "Total" does not override the amount due."""
+    assert extract_total_amount("Amount Due: $1,250.00\nTotal 3") == '1250.00'
+    assert extract_total_amount("Grand Total 5.00\nTotal 7.00") == '5.00'
+    assert extract_total_amount("Total 3") is None
@@ -22,12 +22,31 @@ class TestDateParser:
             result = DateParser.parse_date(input_date)
             assert result == expected, f"Failed for {input_date}"
     
+    def test_parse_ambiguous_slash_dates(self):
+        """Test day-first is preferred for slash dates, with month-first as a fallback."""
+        assert DateParser.parse_date("05/06/2024") == "2024-06-05"
+        assert DateParser.parse_date("06/17/2024") == "2024-06-17"
+        assert DateParser.parse_date("17\tJun\t2024") == "2024-06-17"
+    
+    def test_parse_numeric_dates_validates_calendar(self):
+        """Test unpadded numeric dates parse and impossible dates are rejected."""
+        assert DateParser.parse_date("2024-6-7") == "2024-06-07"
+        assert DateParser.parse_date("29.02.2024") == "2024-02-29"
+        assert DateParser.parse_date("31/02/2024") is None
+        assert DateParser.parse_date("17-06-20245") is None
+    
     def test_parse_invalid_date(self):
         """Test parsing invalid date returns None."""
         assert DateParser.parse_date("invalid") is None
         assert DateParser.parse_date("Unknown") is None
         assert DateParser.parse_date("") is None
     
+    def test_format_date_for_display(self):
+        """Test stored dates are reformatted and invalid ones are returned unchanged."""
+        assert DateParser.format_date_for_display("2024-06-07") == "07-06-2024"
+        assert DateParser.format_date_for_display("2024-06-07", "%b %d, %Y") == "Jun 07, 2024"
+        assert DateParser.format_date_for_display("2024-02-30") == "2024-02-30"
+    
     def test_validate_date_range(self):
         """Test date range validation."""
         assert DateParser.validate_date_range("2024-01-01", "2024-12-31") is True
@@ -47,12 +66,23 @@ class TestAmountParser:
             ("1500", 1500.0),
             ("€ 2,500.75", 2500.75),
             ("1.500,50", 1500.50),  # European format
+            ("1 234,56", 1234.56),  # Space-grouped thousands
+            ("1,234", 1234.0),  # Thousands separator only
+            ("1.234.567", 1234567.0),
+            ("12,5", 12.5),
+            ("USD 1,180.00 (incl. tax)", 1180.0),
         ]
         
         for input_amount, expected in test_cases:
             result = AmountParser.parse_amount(input_amount)
             assert result == pytest.approx(expected), f"Failed for {input_amount}"
     
+    def test_parse_negative_amounts(self):
+        """Test a minus sign before the currency symbol is kept (credit notes)."""
+        assert AmountParser.parse_amount("-$500") == pytest.approx(-500.0)
+        assert AmountParser.parse_amount("- ₹ 1,200.00") == pytest.approx(-1200.0)
+        assert AmountParser.parse_amount("-1.234,56") == pytest.approx(-1234.56)
+    
     def test_parse_invalid_amount(self):
         """Test parsing invalid amount returns None."""
         assert AmountParser.parse_amount("invalid") is None